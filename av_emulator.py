@@ -0,0 +1,316 @@
+"""Local Alpha Vantage stand-in for offline runs and deterministic tests.
+
+Serves the query endpoints the bot uses (GLOBAL_QUOTE, REALTIME_BULK_QUOTES
+and CURRENCY_EXCHANGE_RATE) from seeded random-walk or scripted price
+series, with configurable response latency. It reproduces the payloads the
+real API sends for rate limits ("Note") and bad requests ("Error Message").
+Point the bot at it with ALPHA_VANTAGE_BASE_URL:
+
+    python av_emulator.py --port 8765 --per-minute 5 --latency lognormal:0.08:0.5
+    ALPHA_VANTAGE_BASE_URL=http://127.0.0.1:8765/query python main.py
+
+It also stands in for a streaming tick feed, over websocket (/stream) or
+server-sent events (/events), at --tick-rate ticks per second:
+
+    STREAM_URL=ws://127.0.0.1:8765/stream?symbols=MSTR python main.py
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import deque
+from datetime import datetime
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_NOTE = (
+    'Thank you for using Alpha Vantage! Our standard API call frequency is {per_minute} calls per '
+    'minute and {per_day} calls per day. Please visit https://www.alphavantage.co/premium/ if you '
+    'would like to target a higher API call frequency.'
+)
+INVALID_CALL = (
+    'Invalid API call. Please retry or visit the documentation (https://www.alphavantage.co/documentation/) '
+    'for {function}.'
+)
+
+
+class LatencyModel:
+    """Response delay distribution parsed from 'kind:param[:param]'.
+
+    fixed:SECONDS, uniform:LOW:HIGH, exponential:MEAN and
+    lognormal:MEDIAN:SIGMA are supported.
+    """
+
+    def __init__(self, spec='fixed:0', rng=None):
+        self.spec = spec
+        self.random = rng or random.Random()
+        kind, *params = spec.split(':')
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        if kind not in ('fixed', 'uniform', 'exponential', 'lognormal'):
+            raise ValueError(f"Unknown latency distribution '{kind}'")
+
+    def sample(self):
+        if self.kind == 'fixed':
+            return self.params[0] if self.params else 0.0
+        if self.kind == 'uniform':
+            return self.random.uniform(self.params[0], self.params[1])
+        if self.kind == 'exponential':
+            return self.random.expovariate(1 / self.params[0]) if self.params[0] > 0 else 0.0
+        median, sigma = self.params
+        return self.random.lognormvariate(0, sigma) * median
+
+
+class PriceSeries:
+    """Price path for one symbol: scripted values, or a seeded random walk"""
+
+    def __init__(self, start=350.0, volatility=0.002, script=None, rng=None):
+        self.script = list(script or [])
+        self.random = rng or random.Random()
+        self.volatility = volatility
+        self.previous_close = self.script[0] if self.script else start
+        self.price = self.previous_close
+        self.index = 0
+
+    def next(self):
+        if self.script:
+            # Scripted series hold their last value once exhausted
+            self.price = self.script[min(self.index, len(self.script) - 1)]
+            self.index += 1
+        else:
+            self.price = round(self.price * (1 + self.random.gauss(0, self.volatility)), 4)
+        return self.price
+
+    @property
+    def change(self):
+        return self.price - self.previous_close
+
+
+class AlphaVantageEmulator:
+    """aiohttp application emulating the Alpha Vantage query endpoint"""
+
+    def __init__(self, latency='fixed:0', per_minute=0, per_day=0, note_rate=0.0, error_rate=0.0,
+                 script=None, symbols=None, start_price=350.0, volatility=0.002, tick_rate=5.0, seed=1):
+        self.random = random.Random(seed)
+        self.latency = LatencyModel(latency, self.random)
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.note_rate = note_rate
+        self.error_rate = error_rate
+        self.start_price = start_price
+        self.volatility = volatility
+        self.tick_rate = tick_rate
+        self.series = {}
+        for symbol, prices in (script or {}).items():
+            self.series[symbol.upper()] = PriceSeries(script=prices, rng=self.random)
+        # With a script, only scripted (or explicitly listed) symbols are valid
+        self.known_symbols = {s.upper() for s in (symbols or [])} | set(self.series) if (script or symbols) else None
+        self.requests = 0
+        self.served_today = 0
+        self._recent = deque()
+        self.runner = None
+        self.url = None
+
+    def _series(self, symbol):
+        symbol = symbol.upper()
+        if self.known_symbols is not None and symbol not in self.known_symbols:
+            return None
+        if symbol not in self.series:
+            self.series[symbol] = PriceSeries(self.start_price, self.volatility, rng=self.random)
+        return self.series[symbol]
+
+    def _rate_limited(self):
+        now = time.monotonic()
+        while self._recent and self._recent[0] < now - 60:
+            self._recent.popleft()
+        if self.per_minute and len(self._recent) >= self.per_minute:
+            return True
+        if self.per_day and self.served_today >= self.per_day:
+            return True
+        if self.note_rate and self.random.random() < self.note_rate:
+            return True
+        self._recent.append(now)
+        self.served_today += 1
+        return False
+
+    def _note(self):
+        return {'Note': RATE_LIMIT_NOTE.format(per_minute=self.per_minute or 5, per_day=self.per_day or 25)}
+
+    @staticmethod
+    def _error(function):
+        return {'Error Message': INVALID_CALL.format(function=function or 'the requested function')}
+
+    def _global_quote(self, query):
+        series = self._series(query.get('symbol', ''))
+        if series is None:
+            return self._error('GLOBAL_QUOTE')
+        price = series.next()
+        return {'Global Quote': {
+            '01. symbol': query['symbol'].upper(),
+            '05. price': f'{price:.4f}',
+            '06. volume': str(self.random.randint(1_000_000, 20_000_000)),
+            '07. latest trading day': datetime.now().date().isoformat(),
+            '08. previous close': f'{series.previous_close:.4f}',
+            '09. change': f'{series.change:.4f}',
+            '10. change percent': f'{series.change / series.previous_close * 100:.4f}%',
+        }}
+
+    def _bulk_quotes(self, query):
+        rows = []
+        for symbol in query.get('symbol', '').split(','):
+            series = self._series(symbol.strip()) if symbol.strip() else None
+            if series is None:
+                continue
+            price = series.next()
+            rows.append({
+                'symbol': symbol.strip().upper(),
+                'timestamp': datetime.now().isoformat(sep=' ', timespec='seconds'),
+                'close': f'{price:.4f}',
+                'volume': str(self.random.randint(1_000_000, 20_000_000)),
+                'previous_close': f'{series.previous_close:.4f}',
+                'change': f'{series.change:.4f}',
+                'change_percent': f'{series.change / series.previous_close * 100:.4f}',
+            })
+        if not rows:
+            return self._error('REALTIME_BULK_QUOTES')
+        return {'endpoint': 'Realtime Bulk Quotes', 'data': rows}
+
+    def _exchange_rate(self, query):
+        series = self._series(query.get('from_currency', ''))
+        if series is None:
+            return self._error('CURRENCY_EXCHANGE_RATE')
+        price = series.next()
+        return {'Realtime Currency Exchange Rate': {
+            '1. From_Currency Code': query['from_currency'].upper(),
+            '3. To_Currency Code': query.get('to_currency', 'USD').upper(),
+            '5. Exchange Rate': f'{price:.8f}',
+            '6. Last Refreshed': datetime.now().isoformat(sep=' ', timespec='seconds'),
+        }}
+
+    def _ticks(self, symbols):
+        ticks = []
+        for symbol in symbols:
+            series = self._series(symbol.strip()) if symbol.strip() else None
+            if series is None:
+                continue
+            price = series.next()
+            ticks.append({
+                'symbol': symbol.strip().upper(),
+                'price': price,
+                'change': round(series.change, 4),
+                'volume': self.random.randint(100, 10_000),
+                'timestamp': datetime.now().isoformat(),
+            })
+        return ticks
+
+    async def handle_stream(self, request):
+        """Websocket tick feed for the symbols in ?symbols="""
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        symbols = request.query.get('symbols', 'MSTR').split(',')
+        try:
+            while not ws.closed:
+                await ws.send_str(json.dumps(self._ticks(symbols)))
+                await asyncio.sleep(1 / self.tick_rate)
+        except ConnectionResetError:
+            # Client went away between the closed check and the send
+            # (aiohttp's ClientConnectionResetError is a subclass)
+            pass
+        return ws
+
+    async def handle_events(self, request):
+        """Server-sent events tick feed for the symbols in ?symbols="""
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'})
+        await response.prepare(request)
+        symbols = request.query.get('symbols', 'MSTR').split(',')
+        try:
+            while True:
+                await response.write(f'data: {json.dumps(self._ticks(symbols))}\n\n'.encode('utf-8'))
+                await asyncio.sleep(1 / self.tick_rate)
+        except ConnectionResetError:
+            pass
+        return response
+
+    async def handle_query(self, request):
+        self.requests += 1
+        await asyncio.sleep(max(0.0, self.latency.sample()))
+
+        query = request.query
+        function = query.get('function', '').upper()
+        handlers = {
+            'GLOBAL_QUOTE': self._global_quote,
+            'REALTIME_BULK_QUOTES': self._bulk_quotes,
+            'CURRENCY_EXCHANGE_RATE': self._exchange_rate,
+        }
+        if not query.get('apikey'):
+            body = {'Error Message': 'the parameter apikey is invalid or missing.'}
+        elif function not in handlers:
+            body = self._error(function)
+        elif self._rate_limited():
+            body = self._note()
+        elif self.error_rate and self.random.random() < self.error_rate:
+            body = self._error(function)
+        else:
+            body = handlers[function](query)
+        return web.json_response(body)
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_get('/query', self.handle_query)
+        app.router.add_get('/stream', self.handle_stream)
+        app.router.add_get('/events', self.handle_events)
+        return app
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Serve on host:port (0 picks a free port); returns the query URL"""
+        self.runner = web.AppRunner(self.make_app(), access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+        bound_port = self.runner.addresses[0][1]
+        self.url = f'http://{host}:{bound_port}/query'
+        return self.url
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Alpha Vantage emulator')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='fixed:0', help="e.g. 'fixed:0.1', 'uniform:0.05:0.3', 'lognormal:0.08:0.5'")
+    parser.add_argument('--per-minute', type=int, default=0, help='calls per minute before Note responses, 0 for unlimited')
+    parser.add_argument('--per-day', type=int, default=0, help='calls per day before Note responses, 0 for unlimited')
+    parser.add_argument('--note-rate', type=float, default=0.0, help='probability of a random Note response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='probability of a random Error Message')
+    parser.add_argument('--script', help='JSON file mapping symbols to lists of prices')
+    parser.add_argument('--start-price', type=float, default=350.0)
+    parser.add_argument('--volatility', type=float, default=0.002)
+    parser.add_argument('--tick-rate', type=float, default=5.0, help='ticks per second on /stream and /events')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script, encoding='utf-8') as f:
+            script = json.load(f)
+
+    emulator = AlphaVantageEmulator(
+        latency=args.latency, per_minute=args.per_minute, per_day=args.per_day,
+        note_rate=args.note_rate, error_rate=args.error_rate, script=script,
+        start_price=args.start_price, volatility=args.volatility, tick_rate=args.tick_rate, seed=args.seed
+    )
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger.info(f"Alpha Vantage emulator on http://{args.host}:{args.port}/query")
+    web.run_app(emulator.make_app(), host=args.host, port=args.port, print=None)
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,296 @@
+"""Load-test harness for the nickname fan-out and the full update cycle.
+
+Runs the real bot code against an in-process fake of the Discord member
+API (N guilds with configurable edit latency, 429 and Forbidden rates) and
+the local Alpha Vantage emulator (av_emulator.py), then reports
+cycle time, edits/sec, latency percentiles and peak RSS, plus the API
+calls the presence display mode saves over nickname edits. Every run is
+appended as one JSON line to the results file so regressions show up
+when runs are compared over time.
+
+    python benchmark.py --guilds 10000 --latency-ms 40 --p429 0.001 --forbidden 0.02
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+# Quiet, file-less logging and no persisted state before the bot module loads
+os.environ.setdefault('DISCORD_BOT_TOKEN', 'benchmark')
+os.environ.setdefault('LOG_FILE', '')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ.setdefault('QUOTA_SCHEDULING', 'false')
+os.environ.setdefault('MARKET_CALENDAR', 'false')
+os.environ.setdefault('STATE_PATH', '')
+os.environ.setdefault('PREFETCH_ON_START', 'false')
+os.environ.setdefault('SYNC_COMMANDS', 'false')
+
+import discord
+
+from av_emulator import AlphaVantageEmulator
+from fanout import NicknameFanout
+from main import MSTRTickerBot
+from providers import AlphaVantageProvider
+
+
+class FakeMember:
+    """Stands in for the bot's own discord.Member in one guild"""
+
+    def __init__(self, api, guild):
+        self.api = api
+        self.guild = guild
+        self.nick = None
+
+    async def edit(self, nick=None):
+        await self.api.edit(self, nick)
+
+
+class FakeGuild:
+    def __init__(self, api, guild_id, shard_id=0):
+        self.id = guild_id
+        self.name = f'guild-{guild_id}'
+        self.shard_id = shard_id
+        self.me = FakeMember(api, self)
+
+
+class FakeDiscordAPI:
+    """Simulated member edit endpoint with latency, 429 and Forbidden injection.
+
+    Like discord.py, a 429 whose retry_after is within max_ratelimit_timeout
+    is slept out inside the call and the request retried; only longer ones
+    surface as discord.RateLimited.
+    """
+
+    def __init__(self, latency_ms=40.0, jitter_ms=10.0, p429=0.0, retry_after=1.0,
+                 max_ratelimit_timeout=30.0, forbidden=0.0, seed=1):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.p429 = p429
+        self.retry_after = retry_after
+        self.max_ratelimit_timeout = max_ratelimit_timeout
+        self.forbidden_rate = forbidden
+        self.random = random.Random(seed)
+        self.forbidden_guilds = set()
+        self.calls = 0
+        self.rate_limited = 0
+        self.presence_updates = 0
+        self.edit_latencies = []
+        self.completion_offsets = []
+        self.cycle_start = time.perf_counter()
+
+    def make_guilds(self, count, shard_count=1):
+        guilds = [FakeGuild(self, guild_id, guild_id % shard_count) for guild_id in range(count)]
+        # Forbidden is a property of the guild, so it is the same guilds every cycle
+        self.forbidden_guilds = {g.id for g in guilds if self.random.random() < self.forbidden_rate}
+        return guilds
+
+    def start_cycle(self):
+        self.rate_limited = 0
+        self.edit_latencies = []
+        self.completion_offsets = []
+        self.cycle_start = time.perf_counter()
+
+    async def change_presence(self, activity):
+        """One gateway presence op; reaches every guild on the shard"""
+        self.presence_updates += 1
+        await asyncio.sleep(max(0.0, self.random.gauss(self.latency, self.jitter)))
+
+    async def edit(self, member, nick):
+        self.calls += 1
+        start = time.perf_counter()
+        await asyncio.sleep(max(0.0, self.random.gauss(self.latency, self.jitter)))
+        try:
+            if member.guild.id in self.forbidden_guilds:
+                raise discord.Forbidden(SimpleNamespace(status=403, reason='Forbidden'), 'Missing Permissions')
+            if self.random.random() < self.p429:
+                self.rate_limited += 1
+                if self.retry_after > self.max_ratelimit_timeout:
+                    raise discord.RateLimited(self.retry_after)
+                # Short limits are slept out in the call, then the request is sent again
+                await asyncio.sleep(self.retry_after)
+                self.calls += 1
+                await asyncio.sleep(max(0.0, self.random.gauss(self.latency, self.jitter)))
+            member.nick = nick
+        finally:
+            end = time.perf_counter()
+            self.edit_latencies.append(end - start)
+            self.completion_offsets.append(end - self.cycle_start)
+
+
+class BenchBot(MSTRTickerBot):
+    """The real bot with its guild list, user and gateway swapped for fakes"""
+
+    def __init__(self, api, guilds):
+        super().__init__()
+        self._bench_api = api
+        self._bench_guilds = guilds
+        self._bench_user = SimpleNamespace(id=1)
+        self.member_index.rebuild(guilds)
+
+    async def change_presence(self, activity=None, status=None):
+        await self._bench_api.change_presence(activity)
+
+    @property
+    def guilds(self):
+        return self._bench_guilds
+
+    @property
+    def user(self):
+        return self._bench_user
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def cycle_result(name, api, stats, duration, calls_before):
+    return {
+        'scenario': name,
+        'duration_s': round(duration, 4),
+        'guilds': stats.total if stats else 0,
+        'updated': stats.updated if stats else 0,
+        'skipped': stats.skipped if stats else 0,
+        'forbidden': stats.forbidden if stats else 0,
+        'quarantined': stats.quarantined if stats else 0,
+        'rate_limited': stats.rate_limited if stats else 0,
+        'http_429': api.rate_limited,
+        'failed': stats.failed if stats else 0,
+        'api_calls': api.calls - calls_before,
+        'edits_per_sec': round(stats.edits_per_sec, 2) if stats else 0.0,
+        'edit_latency_p50_ms': round(percentile(api.edit_latencies, 0.50) * 1000, 2),
+        'edit_latency_p99_ms': round(percentile(api.edit_latencies, 0.99) * 1000, 2),
+        'time_to_update_p50_s': round(percentile(api.completion_offsets, 0.50), 4),
+        'time_to_update_p99_s': round(percentile(api.completion_offsets, 0.99), 4),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+async def run_benchmark(args):
+    api = FakeDiscordAPI(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, p429=args.p429,
+        retry_after=args.retry_after, max_ratelimit_timeout=args.max_ratelimit_timeout,
+        forbidden=args.forbidden, seed=args.seed
+    )
+    quote_server = AlphaVantageEmulator(latency=f'fixed:{args.quote_latency_ms / 1000}', seed=args.seed)
+    await quote_server.start()
+
+    bot = BenchBot(api, api.make_guilds(args.guilds))
+    bot.quota_scheduler = None
+    bot.market_calendar = None
+    bot.fanout = NicknameFanout(concurrency=args.concurrency, rate_per_second=args.edit_rate or 1e9)
+    bot.quote_client = AlphaVantageProvider('benchmark', base_url=quote_server.url)
+    await bot.setup_hook()
+
+    results = []
+    try:
+        # Fan-out only: a new nickname every cycle, so every guild is edited
+        for cycle in range(args.cycles):
+            api.start_cycle()
+            calls_before = api.calls
+            start = time.perf_counter()
+            await bot.update_nickname_in_guilds(f'$MSTR: ${300 + cycle:.2f} 📈')
+            results.append(cycle_result('fanout', api, bot.last_fanout_stats, time.perf_counter() - start, calls_before))
+
+        # Same nickname again: measures the skip path
+        api.start_cycle()
+        calls_before = api.calls
+        start = time.perf_counter()
+        await bot.update_nickname_in_guilds(f'$MSTR: ${300 + args.cycles - 1:.2f} 📈')
+        results.append(cycle_result('fanout_unchanged', api, bot.last_fanout_stats, time.perf_counter() - start, calls_before))
+
+        # Full update cycle: quote fetch from the emulator plus fan-out
+        for _ in range(args.cycles):
+            api.start_cycle()
+            calls_before = api.calls
+            start = time.perf_counter()
+            await bot.update_price_cycle()
+            result = cycle_result('update_cycle', api, bot.last_fanout_stats, time.perf_counter() - start, calls_before)
+            result['quote_requests'] = quote_server.requests
+            results.append(result)
+
+        # Presence display: one gateway op per shard instead of one edit per guild
+        bot.display_mode = 'presence'
+        nickname_calls = statistics.mean(r['api_calls'] for r in results if r['scenario'] == 'fanout')
+        for cycle in range(args.cycles):
+            api.start_cycle()
+            calls_before = api.calls
+            presence_before = api.presence_updates
+            start = time.perf_counter()
+            await bot.update_display(f'$MSTR: ${400 + cycle:.2f} 📈')
+            result = cycle_result('presence', api, None, time.perf_counter() - start, calls_before)
+            result['guilds'] = args.guilds
+            result['api_calls'] += api.presence_updates - presence_before
+            result['api_calls_saved'] = round(nickname_calls - result['api_calls'], 1)
+            results.append(result)
+    finally:
+        if bot.quote_session is not None:
+            await bot.quote_session.close()
+        await quote_server.stop()
+
+    return results
+
+
+def print_results(results):
+    columns = ['scenario', 'duration_s', 'updated', 'skipped', 'forbidden', 'http_429', 'rate_limited', 'api_calls',
+               'api_calls_saved', 'edits_per_sec', 'edit_latency_p50_ms', 'edit_latency_p99_ms',
+               'time_to_update_p99_s', 'peak_rss_mb']
+    print('  '.join(f'{c:>14}' for c in columns))
+    for result in results:
+        print('  '.join(f'{str(result.get(c, "")):>14}' for c in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the nickname fan-out and update cycle')
+    parser.add_argument('--guilds', type=int, default=10000)
+    parser.add_argument('--cycles', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv('EDIT_CONCURRENCY', '10')))
+    parser.add_argument('--edit-rate', type=float, default=0.0, help='edits/sec limit, 0 for unlimited')
+    parser.add_argument('--latency-ms', type=float, default=40.0, help='mean member.edit latency')
+    parser.add_argument('--jitter-ms', type=float, default=10.0)
+    parser.add_argument('--p429', type=float, default=0.0, help='probability an edit is rate limited')
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--max-ratelimit-timeout', type=float, default=float(os.getenv('MAX_RATELIMIT_TIMEOUT', '30')),
+                        help='429s with a longer retry-after raise RateLimited instead of sleeping in the call')
+    parser.add_argument('--forbidden', type=float, default=0.0, help='fraction of guilds without permission')
+    parser.add_argument('--quote-latency-ms', type=float, default=50.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--results', default='bench_results.jsonl', help='JSON lines file results are appended to')
+    args = parser.parse_args()
+    args.cycles = max(1, args.cycles)
+
+    results = asyncio.run(run_benchmark(args))
+    print_results(results)
+
+    record = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'config': vars(args),
+        'results': results,
+        'edits_per_sec_mean': round(statistics.mean(r['edits_per_sec'] for r in results if r['scenario'] == 'fanout'), 2),
+        'presence_api_calls_saved_mean': round(statistics.mean(r['api_calls_saved'] for r in results if r['scenario'] == 'presence'), 1),
+    }
+    with open(args.results, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + '\n')
+    print(f'Results appended to {args.results}')
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
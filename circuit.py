@@ -0,0 +1,95 @@
+import logging
+import random
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker with exponential backoff and full jitter.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls are rejected without touching the upstream. Once the cooldown has
+    passed one trial call is let through (half-open): success closes the
+    circuit, failure reopens it with the next backoff step. The cooldown
+    for the n-th consecutive opening is drawn uniformly from
+    [0, min(max_delay, base_delay * 2 ** n)] so that restarts and multiple
+    processes don't retry in lockstep.
+    """
+
+    def __init__(self, name, failure_threshold=3, base_delay=30.0, max_delay=1800.0, rng=None):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.random = rng or random.Random()
+        self.state = CLOSED
+        self.failures = 0
+        self.openings = 0
+        self.retry_at = 0.0
+        self.rejected = 0
+
+    @property
+    def retry_in(self):
+        """Seconds until an open circuit lets a trial call through, 0 otherwise"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.retry_at - time.monotonic())
+
+    def allow(self):
+        """Whether a call may go upstream now"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() >= self.retry_at:
+            self._transition(HALF_OPEN)
+            return True
+        # Open and cooling down, or half-open with the trial call in flight
+        self.rejected += 1
+        metrics.CIRCUIT_REJECTED.inc()
+        return False
+
+    def release(self):
+        """Abandon a half-open trial without a verdict (e.g. it was cancelled)"""
+        if self.state == HALF_OPEN:
+            self.retry_at = time.monotonic()
+            self._transition(OPEN, " after the trial call was cancelled, next call retries")
+
+    def record_success(self):
+        if self.state == OPEN:
+            # A call that started before the circuit opened; not a trial
+            return
+        self.failures = 0
+        self.openings = 0
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        if self.state == OPEN:
+            # Already open: a late failure must not restart or extend the cooldown
+            return
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        ceiling = min(self.max_delay, self.base_delay * 2 ** self.openings)
+        delay = self.random.uniform(0, ceiling)
+        self.openings += 1
+        self.retry_at = time.monotonic() + delay
+        self._transition(OPEN, f" after {self.failures} failures, retrying in {delay:.1f}s (max {ceiling:.0f}s)")
+
+    def _transition(self, state, detail=''):
+        previous, self.state = self.state, state
+        if previous == CLOSED and state != CLOSED:
+            metrics.CIRCUITS_OPEN.inc()
+        elif previous != CLOSED and state == CLOSED:
+            metrics.CIRCUITS_OPEN.dec()
+        metrics.CIRCUIT_TRANSITIONS.inc()
+        log = logger.info if state == CLOSED else logger.warning
+        log(f"Circuit for {self.name} {previous} -> {state}{detail}")
@@ -0,0 +1,347 @@
+import asyncio
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import struct
+import time
+from datetime import datetime, timedelta
+from multiprocessing import shared_memory
+
+import aiohttp
+
+from market_calendar import market_calendar_from_env
+from providers import provider_from_env
+from quota import quota_scheduler_from_env
+from quotes import SymbolRegistry, make_quote
+
+logger = logging.getLogger(__name__)
+
+
+class PriceSegment:
+    """Fixed-layout shared-memory block holding the latest quote per symbol.
+
+    Layout (little endian):
+        header: magic(4s) version(H) slot_count(H) sequence(Q) api_calls(Q)
+        slots:  symbol(16s) price(d) change(d) volume(d) timestamp(d)
+
+    The single writer bumps the sequence to an odd value before touching
+    the slots and back to even afterwards (a seqlock), so readers in other
+    processes retry instead of seeing a half-written quote.
+    """
+
+    MAGIC = b'MSTR'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHHQQ')
+    SLOT = struct.Struct('<16sdddd')
+    SEQUENCE_OFFSET = 8
+
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.owner = owner
+        magic, version, slot_count, _, _ = self.HEADER.unpack_from(shm.buf, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError(f"Shared memory segment {shm.name} is not a price segment")
+        self.slot_count = slot_count
+        self.symbols = [self._slot(i)[0] for i in range(slot_count)]
+
+    @classmethod
+    def create(cls, symbols):
+        """Create a new segment with one slot per symbol name"""
+        size = cls.HEADER.size + cls.SLOT.size * len(symbols)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        cls.HEADER.pack_into(shm.buf, 0, cls.MAGIC, cls.VERSION, len(symbols), 0, 0)
+        for i, name in enumerate(symbols):
+            cls.SLOT.pack_into(shm.buf, cls._slot_offset(i), name.encode('ascii'), 0.0, 0.0, 0.0, 0.0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """Attach to a segment created by another process"""
+        return cls(shared_memory.SharedMemory(name=name))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @classmethod
+    def _slot_offset(cls, index):
+        return cls.HEADER.size + cls.SLOT.size * index
+
+    def _slot(self, index):
+        raw, price, change, volume, timestamp = self.SLOT.unpack_from(self.shm.buf, self._slot_offset(index))
+        return raw.rstrip(b'\0').decode('ascii'), price, change, volume, timestamp
+
+    def _sequence(self):
+        return struct.unpack_from('<Q', self.shm.buf, self.SEQUENCE_OFFSET)[0]
+
+    @property
+    def sequence(self):
+        """Write counter; it changes (to an even value) after every publish"""
+        return self._sequence()
+
+    def _set_sequence(self, value):
+        struct.pack_into('<Q', self.shm.buf, self.SEQUENCE_OFFSET, value)
+
+    def publish(self, quotes, api_calls):
+        """Write the quotes that were fetched; symbols without a quote keep their old slot"""
+        sequence = self._sequence()
+        self._set_sequence(sequence + 1)
+        try:
+            for i, name in enumerate(self.symbols):
+                quote = quotes.get(name)
+                if quote:
+                    self.SLOT.pack_into(
+                        self.shm.buf, self._slot_offset(i), name.encode('ascii'),
+                        quote['price'], quote['change'], quote.get('volume', 0.0),
+                        quote['timestamp'].timestamp()
+                    )
+            struct.pack_into('<Q', self.shm.buf, self.HEADER.size - 8, api_calls)
+        finally:
+            self._set_sequence(sequence + 2)
+
+    def read(self):
+        """Return ({symbol: price_data}, api_calls) from a consistent snapshot"""
+        while True:
+            before = self._sequence()
+            if before % 2:
+                time.sleep(0)
+                continue
+            slots = [self._slot(i) for i in range(self.slot_count)]
+            api_calls = struct.unpack_from('<Q', self.shm.buf, self.HEADER.size - 8)[0]
+            if self._sequence() == before:
+                break
+
+        quotes = {}
+        for name, price, change, volume, timestamp in slots:
+            # A zero timestamp means the slot was never written
+            if timestamp:
+                quotes[name] = make_quote(name, price, change, volume, datetime.fromtimestamp(timestamp))
+        return quotes, api_calls
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedQuoteReader:
+    """Quote source for cluster workers that reads the shared segment.
+
+    It stands in for the quote provider on the bot, so workers never make
+    quote HTTP calls themselves; call_count reports the fetcher's total.
+    """
+
+    def __init__(self, segment, wait_timeout=30.0):
+        self.segment = segment
+        self.wait_timeout = wait_timeout
+        self._api_calls = 0
+
+    @property
+    def call_count(self):
+        return self._api_calls
+
+    def calls_per_cycle(self, symbols):
+        return 0
+
+    async def fetch_quotes(self, session, symbols):
+        """Return the published quotes, waiting briefly for the fetcher's first write"""
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            quotes, self._api_calls = self.segment.read()
+            if quotes or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(0.5)
+
+        return {s.name: quotes[s.name] for s in symbols if s.name in quotes}
+
+
+class SegmentWatcher:
+    """Scheduled job for cluster workers: run the quote cycle when the fetcher publishes.
+
+    Polling the sequence is one shared-memory read, so workers pick up a
+    publish within `poll_interval` seconds instead of guessing when the
+    fetcher's HTTP round trip finishes (e.g. the final fetch after close).
+    """
+
+    def __init__(self, bot, segment, poll_interval=1.0):
+        self.bot = bot
+        self.segment = segment
+        self.poll_interval = poll_interval
+        self.sequence = segment.sequence
+
+    async def __call__(self):
+        sequence = self.segment.sequence
+        if sequence != self.sequence and sequence % 2 == 0:
+            self.sequence = sequence
+            self.bot.scheduler.schedule('quote_refresh', self.bot.update_price_cycle)
+        return self.poll_interval
+
+
+def split_shards(shard_count, workers):
+    """Split range(shard_count) into contiguous, near-equal ranges, one per worker"""
+    base, extra = divmod(shard_count, workers)
+    ranges, start = [], 0
+    for i in range(workers):
+        size = base + (1 if i < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return [r for r in ranges if r]
+
+
+async def _fetch_loop(segment, client, symbols, interval_minutes, timeout, retry_seconds=60):
+    """Fetch quotes forever and publish them into the segment"""
+    calendar = market_calendar_from_env(symbols)
+    scheduler = quota_scheduler_from_env(calendar)
+    calls = client.calls_per_cycle(symbols)
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        while True:
+            try:
+                if scheduler and not scheduler.budget.can_spend(calls):
+                    logger.warning("API budget too low, postponing fetch")
+                    quotes = {}
+                else:
+                    calls_before = client.call_count
+                    quotes = await client.fetch_quotes(session, symbols)
+                    segment.publish(quotes, client.call_count)
+                    if scheduler:
+                        scheduler.budget.record(client.call_count - calls_before)
+                        await scheduler.budget.persist()
+
+                if quotes:
+                    logger.info(f"Published {len(quotes)}/{len(symbols)} quotes to shared memory")
+                else:
+                    logger.error("Quote fetch failed or was postponed")
+
+                if scheduler:
+                    delay = scheduler.next_interval(calls)
+                else:
+                    delay = interval_minutes * 60 if quotes else retry_seconds
+                if calendar is not None:
+                    now = datetime.now()
+                    next_at = calendar.next_fetch_time(now, now + timedelta(seconds=delay))
+                    delay = (next_at - now).total_seconds()
+
+            except Exception as e:
+                # Keep the fetcher alive; workers would otherwise serve frozen quotes
+                logger.error(f"Error in quote fetcher: {e}")
+                delay = retry_seconds
+            await asyncio.sleep(max(0.0, delay))
+
+
+def _fetcher_main(segment_name):
+    """Entry point of the single quote fetcher process"""
+    segment = PriceSegment.attach(segment_name)
+    symbols = SymbolRegistry.from_spec(os.getenv('TICKER_SYMBOLS', 'MSTR'))
+    client = provider_from_env()
+    try:
+        asyncio.run(_fetch_loop(
+            segment, client, symbols,
+            float(os.getenv('UPDATE_INTERVAL_MINUTES', '5')),
+            float(os.getenv('HTTP_TIMEOUT_SECONDS', '10'))
+        ))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        segment.close()
+
+
+def _worker_main(segment_name, shard_count, shard_ids, index):
+    """Entry point of a worker process owning a range of shards"""
+    # Each worker serves metrics on its own port, METRICS_PORT + index
+    if int(os.getenv('METRICS_PORT', '0')):
+        os.environ['METRICS_PORT'] = str(int(os.environ['METRICS_PORT']) + index)
+    # Workers own different guilds, so each keeps its own state snapshot
+    state_path = os.getenv('STATE_PATH', 'bot_state.json')
+    if state_path:
+        os.environ['STATE_PATH'] = f'{state_path}.{index}'
+    # Commands are global, so one worker syncing them is enough
+    if index > 0:
+        os.environ['SYNC_COMMANDS'] = 'false'
+
+    # Imported here because main imports this module
+    from main import ShardedMSTRTickerBot
+
+    segment = PriceSegment.attach(segment_name)
+    try:
+        bot = ShardedMSTRTickerBot(shard_count=shard_count, shard_ids=shard_ids)
+        bot.quote_client = SharedQuoteReader(segment)
+        # The fetcher process owns the API budget and the market calendar;
+        # workers refresh whenever it publishes, with the fixed interval as a fallback
+        bot.quota_scheduler = None
+        bot.market_calendar = None
+        bot.scheduler.schedule('segment_watch', SegmentWatcher(bot, segment))
+        logger.info(f"Cluster worker {os.getpid()} running shards {shard_ids[0]}-{shard_ids[-1]} of {shard_count}")
+        bot.run(bot.discord_token, log_handler=None)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        segment.close()
+
+
+def _start_fetcher(ctx, segment_name):
+    process = ctx.Process(target=_fetcher_main, args=(segment_name,), name='quote-fetcher')
+    process.start()
+    return process
+
+
+def run_cluster(workers, shard_count):
+    """Spawn one fetcher and `workers` bot processes, and wait for the workers.
+
+    A fetcher that dies is restarted with exponential backoff, up to
+    FETCHER_MAX_RESTARTS times; after that the cluster is stopped rather
+    than left serving frozen quotes.
+    """
+    symbols = SymbolRegistry.from_spec(os.getenv('TICKER_SYMBOLS', 'MSTR'))
+    max_restarts = int(os.getenv('FETCHER_MAX_RESTARTS', '5'))
+    segment = PriceSegment.create(symbols.names)
+    ctx = multiprocessing.get_context('spawn')
+
+    bots = [
+        ctx.Process(target=_worker_main, args=(segment.name, shard_count, shard_ids, i), name=f'bot-worker-{i}')
+        for i, shard_ids in enumerate(split_shards(shard_count, workers))
+    ]
+    fetcher = None
+    restarts = 0
+    fetcher_failed = False
+
+    logger.info(f"Starting cluster: {len(bots)} workers over {shard_count} shards, segment {segment.name}")
+    try:
+        fetcher = _start_fetcher(ctx, segment.name)
+        for process in bots:
+            process.start()
+        while any(process.is_alive() for process in bots):
+            multiprocessing.connection.wait([fetcher.sentinel] + [p.sentinel for p in bots if p.is_alive()])
+            if fetcher.is_alive():
+                continue
+            if restarts >= max_restarts:
+                logger.error(f"Quote fetcher exited with code {fetcher.exitcode} after {restarts} restarts, stopping cluster")
+                fetcher_failed = True
+                break
+            restarts += 1
+            delay = min(60, 2 ** restarts)
+            logger.error(
+                f"Quote fetcher exited with code {fetcher.exitcode}, "
+                f"restarting in {delay}s ({restarts}/{max_restarts})"
+            )
+            time.sleep(delay)
+            fetcher = _start_fetcher(ctx, segment.name)
+    except KeyboardInterrupt:
+        logger.info("Received keyboard interrupt, stopping cluster...")
+    finally:
+        processes = ([fetcher] if fetcher is not None else []) + bots
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            if process.pid is not None:
+                process.join(timeout=10)
+        segment.close()
+
+    failed = [p.name for p in bots if p.exitcode not in (0, None, -15)]
+    if fetcher_failed:
+        failed.insert(0, fetcher.name)
+    if failed:
+        logger.error(f"Cluster processes exited with errors: {', '.join(failed)}")
+        return 1
+    return 0
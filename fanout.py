@@ -0,0 +1,323 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+import discord
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Async token bucket used to stay under Discord's global request limit"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a request token is available"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class FanoutStats:
+    """Outcome of one nickname fan-out cycle"""
+    total: int = 0
+    updated: int = 0
+    skipped: int = 0
+    forbidden: int = 0
+    failed: int = 0
+    rate_limited: int = 0
+    coalesced: int = 0
+    quarantined: int = 0
+    duration: float = 0.0
+
+    @property
+    def edits_per_sec(self):
+        return self.updated / self.duration if self.duration > 0 else 0.0
+
+    @property
+    def in_sync(self):
+        """Guilds that show the requested nickname after this cycle, or will once an edit in flight finishes"""
+        return self.updated + self.skipped + self.coalesced
+
+    @classmethod
+    def combine(cls, results):
+        """Merge stats from fan-outs that ran concurrently (e.g. one per shard)"""
+        combined = cls()
+        for stats in results:
+            combined.total += stats.total
+            combined.updated += stats.updated
+            combined.skipped += stats.skipped
+            combined.forbidden += stats.forbidden
+            combined.failed += stats.failed
+            combined.rate_limited += stats.rate_limited
+            combined.coalesced += stats.coalesced
+            combined.quarantined += stats.quarantined
+            combined.duration = max(combined.duration, stats.duration)
+        return combined
+
+
+class MemberIndex:
+    """The bot's own Member object in each guild, keyed by guild id.
+
+    Maintained from gateway events (guild join, remove, availability and
+    member updates) so the fan-out iterates ready-made members instead of
+    looking the bot up in every guild on every cycle.
+    """
+
+    def __init__(self):
+        self.members = {}
+
+    def __len__(self):
+        return len(self.members)
+
+    def __iter__(self):
+        return iter(list(self.members.values()))
+
+    def get(self, guild_id):
+        return self.members.get(guild_id)
+
+    def add(self, guild):
+        """Index the bot's member in guild; returns False if it is not cached"""
+        member = guild.me
+        if member is None:
+            logger.warning(f"Bot not found as member in guild: {guild.name}")
+            return False
+        self.members[guild.id] = member
+        return True
+
+    def update(self, member):
+        self.members[member.guild.id] = member
+
+    def remove(self, guild_id):
+        self.members.pop(guild_id, None)
+
+    def rebuild(self, guilds):
+        """Re-index every guild, e.g. after READY"""
+        self.members = {}
+        for guild in guilds:
+            self.add(guild)
+
+
+class NicknameFanout:
+    """Edit the bot's nickname across many guilds concurrently.
+
+    At most `concurrency` edits are in flight at once across all run()
+    calls and deferred retries, and every edit first takes a token from a
+    shared bucket so the process stays under Discord's global limit.
+
+    Each guild has a latest-wins pending slot: a nickname requested while
+    an edit for that guild is still in flight replaces whatever was queued
+    behind it, and the running edit loop sends only the newest one when it
+    finishes. Outstanding work is therefore bounded by the guild count, not
+    by how often nicknames are requested. The nickname route is bucketed
+    per guild, so a RateLimited error only holds back that guild: its
+    pending nickname is sent once the guild's own retry window has passed.
+
+    The last nickname successfully applied in each guild is remembered, and
+    guilds already showing the requested nickname are skipped entirely.
+    Guilds that answer Forbidden are quarantined and left out of runs until
+    a re-probe is due; the interval doubles with every failed probe from
+    `quarantine_base` up to `quarantine_max` seconds, and release() lifts
+    the quarantine early when an event shows the permission was granted.
+
+    run() may be called concurrently (one call per shard, or overlapping
+    update paths); all calls share the edit slots, the rate limiter, the
+    pending slots and the applied-nickname map.
+    """
+
+    def __init__(self, concurrency=10, rate_per_second=40.0, quarantine_base=900.0, quarantine_max=86400.0):
+        self.concurrency = max(1, concurrency)
+        # Edits in flight across every run() call, so shards don't multiply the bound
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self.limiter = RateLimiter(rate_per_second)
+        self.quarantine_base = quarantine_base
+        self.quarantine_max = quarantine_max
+        
+        # guild_id -> last applied nickname; values share one str per cycle
+        self.applied = {}
+        self.applied_count = 0
+        self.skipped_count = 0
+        
+        # guild_id -> newest nickname not sent yet; guilds in _active have an edit loop draining it
+        self.pending = {}
+        self._active = set()
+        # guild_id -> monotonic time the guild's rate limit window ends
+        self.retry_at = {}
+        self._deferred = set()
+        
+        # guild_id -> (monotonic time of the next probe, failed probes so far)
+        self.quarantine = {}
+
+    def forget(self, guild_id):
+        """Drop the cached state for a guild (e.g. after leaving it)"""
+        self.applied.pop(guild_id, None)
+        self.pending.pop(guild_id, None)
+        self.retry_at.pop(guild_id, None)
+        self.quarantine.pop(guild_id, None)
+
+    def is_quarantined(self, guild_id):
+        """Whether the guild is quarantined and not yet due for a re-probe"""
+        entry = self.quarantine.get(guild_id)
+        return entry is not None and time.monotonic() < entry[0]
+
+    def release(self, guild_id):
+        """Lift a guild's quarantine; returns whether it was quarantined"""
+        return self.quarantine.pop(guild_id, None) is not None
+
+    def close(self):
+        """Cancel edits deferred past a rate limit (used on shutdown)"""
+        for task in list(self._deferred):
+            task.cancel()
+        self._deferred.clear()
+
+    def _quarantine(self, guild):
+        _, strikes = self.quarantine.get(guild.id, (0.0, 0))
+        interval = min(self.quarantine_max, self.quarantine_base * 2 ** strikes)
+        self.quarantine[guild.id] = (time.monotonic() + interval, strikes + 1)
+        return strikes, interval
+
+    async def run(self, members, nickname):
+        """Apply nickname through each of the bot's guild members and return a FanoutStats"""
+        members = list(members)
+        stats = FanoutStats(total=len(members))
+        start = time.monotonic()
+        
+        owned = []
+        for member in members:
+            guild_id = member.guild.id
+            if self.is_quarantined(guild_id):
+                stats.quarantined += 1
+                continue
+            self.pending[guild_id] = nickname
+            if guild_id in self._active:
+                # An edit loop is already running for this guild and will pick this up
+                stats.coalesced += 1
+            else:
+                self._active.add(guild_id)
+                owned.append(member)
+        pending = iter(owned)
+
+        async def worker():
+            # Workers share one iterator, so each guild is handled exactly once
+            for member in pending:
+                await self._drain_guild(member, stats)
+
+        workers = min(self.concurrency, len(owned))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+
+        stats.duration = time.monotonic() - start
+        self.applied_count += stats.updated
+        self.skipped_count += stats.skipped
+        return stats
+
+    async def _drain_guild(self, member, stats):
+        """Send the guild's pending nickname until none is left, or defer it past a rate limit"""
+        guild = member.guild
+        deferred = False
+        try:
+            while guild.id in self.pending:
+                wait = self.retry_at.get(guild.id, 0.0) - time.monotonic()
+                if wait > 0:
+                    # Don't hold a worker for the guild's retry window
+                    task = asyncio.create_task(self._drain_later(member, wait))
+                    self._deferred.add(task)
+                    task.add_done_callback(self._deferred.discard)
+                    deferred = True
+                    return
+                self.retry_at.pop(guild.id, None)
+                async with self._slots:
+                    await self._edit_guild(member, self.pending.pop(guild.id), stats)
+        finally:
+            if not deferred:
+                self._active.discard(guild.id)
+
+    async def _drain_later(self, member, delay):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self._active.discard(member.guild.id)
+            raise
+        stats = FanoutStats(total=1)
+        await self._drain_guild(member, stats)
+        self.applied_count += stats.updated
+        self.skipped_count += stats.skipped
+        logger.debug(f"Deferred nickname edit in guild {member.guild.name}: {stats}")
+
+    async def _timed_edit(self, member, nickname):
+        start = time.perf_counter()
+        try:
+            await member.edit(nick=nickname)
+        finally:
+            metrics.MEMBER_EDIT_LATENCY.observe(time.perf_counter() - start)
+
+    async def _edit_guild(self, member, nickname, stats):
+        """Edit the nickname in a single guild, recording the outcome"""
+        guild = member.guild
+        try:
+            if member.nick == nickname:
+                # Already showing this nickname, whether or not we applied it
+                self.applied[guild.id] = nickname
+                stats.skipped += 1
+                metrics.SKIPPED_EDITS.inc()
+                return
+            if self.applied.get(guild.id) == nickname:
+                logger.debug(f"Nickname drifted to {member.nick!r} in guild: {guild.name}")
+
+            await self.limiter.acquire()
+            await self._timed_edit(member, nickname)
+
+            self.applied[guild.id] = nickname
+            stats.updated += 1
+            metrics.APPLIED_EDITS.inc()
+            logger.debug(f"Updated nickname in guild: {guild.name}")
+            if self.release(guild.id):
+                logger.info(f"Nickname permission restored in guild {guild.name}, lifted quarantine")
+
+        except discord.Forbidden:
+            # A nickname merged in by an overlapping run would be sent straight
+            # away and counted as a second strike; the quarantine covers it
+            self.pending.pop(guild.id, None)
+            self.applied.pop(guild.id, None)
+            stats.forbidden += 1
+            metrics.FORBIDDEN.inc()
+            strikes, interval = self._quarantine(guild)
+            if strikes == 0:
+                logger.warning(
+                    f"No permission to change nickname in guild: {guild.name}, "
+                    f"quarantined for {interval / 60:.0f} min"
+                )
+            else:
+                logger.debug(f"Still no nickname permission in guild: {guild.name}, next probe in {interval / 60:.0f} min")
+        except discord.RateLimited as e:
+            # Only this guild's bucket is exhausted: requeue unless a newer nickname is already waiting
+            self.retry_at[guild.id] = time.monotonic() + e.retry_after
+            self.pending.setdefault(guild.id, nickname)
+            stats.rate_limited += 1
+            metrics.RATE_LIMITED.inc()
+            logger.warning(f"Rate limited for {e.retry_after:.1f}s in guild {guild.name}, retrying after the window")
+        except discord.HTTPException as e:
+            stats.failed += 1
+            if e.status == 429:
+                stats.rate_limited += 1
+                metrics.RATE_LIMITED.inc()
+            logger.error(f"HTTP error updating nickname in guild {guild.name}: {e}")
+        except Exception as e:
+            stats.failed += 1
+            logger.error(f"Unexpected error updating nickname in guild {guild.name}: {e}")
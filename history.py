@@ -0,0 +1,96 @@
+from array import array
+from datetime import datetime
+
+FIELDS = ('timestamp', 'price', 'change', 'volume')
+
+
+class PriceHistory:
+    """Fixed-capacity ring buffer of quotes for one symbol.
+
+    Each field lives in its own contiguous array of doubles (timestamps are
+    epoch seconds). Every sample is written twice, at i and i + capacity,
+    so the most recent n samples are always one contiguous slice and
+    window() can hand out memoryviews without copying. Appends are O(1) and
+    memory is fixed at 2 * capacity doubles per field.
+    """
+
+    def __init__(self, capacity=1440):
+        if capacity < 1:
+            raise ValueError("History capacity must be positive")
+        self.capacity = capacity
+        self._arrays = {field: array('d', bytes(8 * 2 * capacity)) for field in FIELDS}
+        # Index of the next write within [0, capacity)
+        self._head = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, timestamp, price, change, volume=0.0):
+        """Add one sample, overwriting the oldest once full"""
+        values = (timestamp, price, change, volume)
+        head = self._head
+        for field, value in zip(FIELDS, values):
+            data = self._arrays[field]
+            data[head] = value
+            data[head + self.capacity] = value
+        self._head = (head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def append_quote(self, quote):
+        """Append a price_data dict, ignoring quotes no newer than the last sample"""
+        timestamp = quote['timestamp'].timestamp()
+        if self._count and timestamp <= self.last('timestamp'):
+            return False
+        self.append(timestamp, quote['price'], quote['change'], quote.get('volume', 0.0))
+        return True
+
+    def last(self, field='price'):
+        if not self._count:
+            return None
+        return self._arrays[field][self._head + self.capacity - 1]
+
+    def window(self, field='price', n=None):
+        """Zero-copy memoryview of the last n samples of field, oldest first"""
+        n = self._count if n is None else max(0, min(n, self._count))
+        end = self._head + self.capacity
+        return memoryview(self._arrays[field])[end - n:end]
+
+    def since(self, field, seconds, now=None):
+        """Zero-copy view of the samples from the last `seconds` seconds"""
+        cutoff = (now or datetime.now()).timestamp() - seconds
+        timestamps = self.window('timestamp')
+        # Timestamps are increasing, so binary search for the first sample in range
+        lo, hi = 0, len(timestamps)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if timestamps[mid] < cutoff:
+                lo = mid + 1
+            else:
+                hi = mid
+        return self.window(field, len(timestamps) - lo)
+
+    def percent_change(self, seconds, now=None):
+        """Percent change of the price over the last `seconds`, or None without two samples"""
+        prices = self.since('price', seconds, now)
+        if len(prices) < 2 or prices[0] == 0:
+            return None
+        return (prices[-1] - prices[0]) / prices[0] * 100
+
+
+class HistoryStore:
+    """One PriceHistory per tracked symbol"""
+
+    def __init__(self, symbols, capacity=1440):
+        self.capacity = capacity
+        self.histories = {name: PriceHistory(capacity) for name in symbols}
+
+    def get(self, name):
+        return self.histories.get(name.upper())
+
+    def record(self, quotes):
+        """Append fetched quotes {name: price_data} to their histories"""
+        for name, quote in quotes.items():
+            history = self.histories.get(name)
+            if history is not None:
+                history.append_quote(quote)
@@ -0,0 +1,122 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+from datetime import datetime, timezone
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Listener started by configure_logging, shared by later calls in the same process
+_listener = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DeferredFormatQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock prepare() formats the full line in the calling thread; here
+    only the message arguments are merged, and the timestamp and layout
+    are rendered by the handlers on the listener thread.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _file_handler(path):
+    """Rotating file handler chosen by LOG_ROTATE ('size' or 'time')"""
+    backups = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+    if os.getenv('LOG_ROTATE', 'size').lower() == 'time':
+        return logging.handlers.TimedRotatingFileHandler(
+            path,
+            when=os.getenv('LOG_ROTATE_WHEN', 'midnight'),
+            backupCount=backups,
+            encoding='utf-8'
+        )
+    return logging.handlers.RotatingFileHandler(
+        path,
+        maxBytes=int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024))),
+        backupCount=backups,
+        encoding='utf-8'
+    )
+
+
+def _process_log_file(path):
+    """Per-process log file for cluster children, e.g. bot.bot-worker-0.log.
+
+    Rotating one file from several processes loses and interleaves records,
+    so only the parent process writes to LOG_FILE itself.
+    """
+    # The name is set before a spawned child re-imports the main module
+    name = multiprocessing.current_process().name
+    if not path or name == 'MainProcess':
+        return path
+    root, ext = os.path.splitext(path)
+    return f'{root}.{name}{ext}'
+
+
+def configure_logging():
+    """Route all logging through a queue drained by a background thread.
+
+    Callers on the event loop only enqueue records; the file and console
+    handlers run on the listener thread. LOG_FILE='' disables the file
+    handler and LOG_JSON=true switches the file output to JSON lines.
+    Returns the running QueueListener; calling it again in the same
+    process returns the existing one.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+
+    log_file = _process_log_file(os.getenv('LOG_FILE', 'bot.log'))
+    if log_file:
+        file_handler = _file_handler(log_file)
+        file_handler.setFormatter(JsonLinesFormatter() if os.getenv('LOG_JSON', 'false').lower() == 'true' else formatter)
+        handlers.append(file_handler)
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    handlers.append(stream_handler)
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DeferredFormatQueueHandler(log_queue))
+    _listener = listener
+    return listener
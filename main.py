@@ -1,49 +1,272 @@
 import discord
-import requests
+import aiohttp
 import asyncio
 import logging
+import math
 import os
-from datetime import datetime
-from discord.ext import tasks
+import sys
+import time
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
+import metrics
+from cluster import run_cluster
+from fanout import FanoutStats, MemberIndex, NicknameFanout
+from history import HistoryStore
+from log_config import configure_logging
+from market_calendar import market_calendar_from_env
+from providers import provider_from_env
+from quota import quota_scheduler_from_env
+from quotes import QuoteCache, SymbolRegistry, make_quote
+from scheduler import DeadlineScheduler
+from slash_commands import command_signature, register_commands
+from state import decode_quote, state_store_from_env
+from streaming import Debouncer, LatestSlot, TickStream
+
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log'),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging (handlers run on a background thread)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 class MSTRTickerBot(discord.Client):
-    def __init__(self):
+    def __init__(self, **options):
         # Set up intents - only need basic intents for nickname updates
         intents = discord.Intents.default()
         intents.guilds = True
         # Note: members intent not needed for updating own nickname
-        super().__init__(intents=intents)
+        
+        # Surface long rate limits as discord.RateLimited instead of sleeping inside the request
+        max_ratelimit_timeout = float(os.getenv('MAX_RATELIMIT_TIMEOUT', '30'))
+        super().__init__(intents=intents, max_ratelimit_timeout=max_ratelimit_timeout, **options)
         
         # Bot configuration
         self.discord_token = os.getenv('DISCORD_BOT_TOKEN')
-        self.alpha_vantage_key = os.getenv('ALPHA_VANTAGE_API_KEY', 'demo')
-        self.update_interval = int(os.getenv('UPDATE_INTERVAL_MINUTES', '5'))
+        self.update_interval = float(os.getenv('UPDATE_INTERVAL_MINUTES', '5'))
+        self.retry_interval = float(os.getenv('RETRY_INTERVAL_SECONDS', '60'))
+        self.reconcile_interval = float(os.getenv('RECONCILE_INTERVAL_SECONDS', '900'))
+        self.http_timeout = float(os.getenv('HTTP_TIMEOUT_SECONDS', '10'))
+        self.http_pool_size = int(os.getenv('HTTP_POOL_SIZE', '10'))
+        
+        # Tracked symbols; the first one is shown in the nickname
+        self.symbols = SymbolRegistry.from_spec(os.getenv('TICKER_SYMBOLS', 'MSTR'))
+        self.quote_client = provider_from_env()
+        
+        # Trading calendar and API budget: adaptive fetch intervals that pause
+        # while the market is closed, or a fixed interval when disabled
+        self.market_calendar = market_calendar_from_env(self.symbols)
+        self.quota_scheduler = quota_scheduler_from_env(self.market_calendar)
+        
+        # Deadline-driven jobs: quote refresh (and its retries) and nickname reconciliation
+        self.scheduler = DeadlineScheduler(error_delay=self.retry_interval)
+        
+        # Nickname fan-out across guilds
+        self.fanout = NicknameFanout(
+            concurrency=int(os.getenv('EDIT_CONCURRENCY', '10')),
+            rate_per_second=float(os.getenv('EDIT_RATE_PER_SECOND', '40')),
+            quarantine_base=float(os.getenv('QUARANTINE_BASE_SECONDS', '900')),
+            quarantine_max=float(os.getenv('QUARANTINE_MAX_SECONDS', '86400'))
+        )
+        self.last_fanout_stats = None
+        
+        # The bot's own Member per guild, maintained from gateway events
+        self.member_index = MemberIndex()
+        
+        # Where the price is shown: 'nickname' (one edit per guild), 'presence'
+        # (one gateway op per shard reaches every guild) or 'both'
+        self.display_mode = os.getenv('DISPLAY_MODE', 'nickname').lower()
+        if self.display_mode not in ('nickname', 'presence', 'both'):
+            raise ValueError(f"Unknown DISPLAY_MODE '{self.display_mode}'")
+        self.presence_activity = os.getenv('PRESENCE_ACTIVITY', 'watching').lower()
+        self.presence_text = None
+        self.presence_updates = 0
+        # Last text shown; reconciliation and newly joined guilds re-apply it
+        self.display_text = None
+        
+        # Long-lived HTTP session for quote requests (created in setup_hook)
+        self.quote_session = None
+        
+        # First quote fetch, started in setup_hook so it overlaps the gateway handshake
+        self.prefetch_on_start = os.getenv('PREFETCH_ON_START', 'true').lower() == 'true'
+        self.prefetch_task = None
+        
+        # Price tracking: per-symbol quote cache, refreshed once per interval
+        self.quote_cache = QuoteCache(
+            self.load_quotes,
+            self.symbols.names,
+            ttl=float(os.getenv('QUOTE_TTL_SECONDS', str(self.update_interval * 60))),
+            stale_while_revalidate=float(os.getenv('QUOTE_STALE_WHILE_REVALIDATE_SECONDS', '60')),
+            stale_if_error=float(os.getenv('QUOTE_STALE_IF_ERROR_SECONDS', '3600'))
+        )
+        
+        # Fixed-size per-symbol price history fed by every fetch
+        self.history = HistoryStore(self.symbols.names, capacity=int(os.getenv('HISTORY_CAPACITY', '1440')))
+        
+        # Optional streaming ingestion: ticks overwrite a latest-value slot and a
+        # debouncer applies them at most once per STREAM_MIN_UPDATE_SECONDS
+        self.stream_url = os.getenv('STREAM_URL')
+        self.tick_slot = LatestSlot()
+        self.tick_stream = None
+        if self.stream_url:
+            self.tick_stream = TickStream(self.stream_url, self.symbols.names, self.tick_slot, connect_timeout=self.http_timeout)
+        self.stream_debouncer = Debouncer(
+            self.tick_slot,
+            self.apply_ticks,
+            min_interval=float(os.getenv('STREAM_MIN_UPDATE_SECONDS', '15'))
+        )
+        self.stream_task = None
+        self.debounce_task = None
+        
+        # Optional Prometheus-style /metrics endpoint (started in setup_hook); local
+        # only unless METRICS_HOST opens it up, e.g. 0.0.0.0 inside a container
+        self.metrics_port = int(os.getenv('METRICS_PORT', '0'))
+        self.metrics_host = os.getenv('METRICS_HOST', '127.0.0.1')
+        self.metrics_runner = None
+        self.register_metrics()
+        
+        # Slash commands answered from the in-memory quote state; synced only when they change
+        self.started_at = time.monotonic()
+        self.tree = discord.app_commands.CommandTree(self)
+        register_commands(self)
+        self.sync_commands_enabled = os.getenv('SYNC_COMMANDS', 'true').lower() == 'true'
+        self.synced_command_signature = None
+        self.sync_task = None
         
-        # Price tracking
-        self.current_price = None
-        self.last_update = None
-        self.api_call_count = 0
+        # Snapshot of quotes and applied nicknames for warm restarts (the API budget has its own file)
+        self.state_store = state_store_from_env()
+        self.state_lock = asyncio.Lock()
+        self.restore_state()
         
         if not self.discord_token:
             logger.error("DISCORD_BOT_TOKEN environment variable is required!")
             raise ValueError("Missing Discord bot token")
             
         logger.info(f"Bot initialized with update interval: {self.update_interval} minutes")
+        logger.info(
+            f"Tracking {len(self.symbols)} symbols ({', '.join(self.symbols.names)}) "
+            f"at {self.quote_client.calls_per_cycle(self.symbols)} API calls per cycle"
+        )
+
+    @property
+    def primary_symbol(self):
+        return self.symbols.primary.name
+
+    @property
+    def current_price(self):
+        """Latest quote for the symbol shown in the nickname"""
+        return self.quote_cache.peek(self.primary_symbol)
+
+    @property
+    def last_update(self):
+        return self.quote_cache.states[self.primary_symbol].last_update
+
+    @property
+    def quote_age(self):
+        """Seconds since the displayed quote was fetched, or None"""
+        return self.quote_cache.age(self.primary_symbol)
+
+    @property
+    def next_fetch_in(self):
+        """Seconds until the next scheduled quote refresh, or None"""
+        return self.scheduler.due_in('quote_refresh')
+
+    @property
+    def api_call_count(self):
+        return self.quote_client.call_count
+
+    def register_metrics(self):
+        """Point the callback-based metrics at this bot's state"""
+        metrics.API_CALLS.set_function(lambda: self.api_call_count)
+        metrics.GUILDS.set_function(lambda: len(self.guilds))
+        metrics.QUARANTINED_GUILDS.set_function(lambda: len(self.fanout.quarantine))
+        metrics.QUOTE_AGE.set_function(lambda: self.quote_age if self.quote_age is not None else math.nan)
+        metrics.API_BUDGET_REMAINING.set_function(
+            lambda: self.quota_scheduler.budget.remaining_today if self.quota_scheduler else math.nan
+        )
+        metrics.API_BUDGET_FORECAST.set_function(
+            lambda: self.quota_scheduler.forecast(self.quote_client.calls_per_cycle(self.symbols))
+            if self.quota_scheduler else math.nan
+        )
+
+    def restore_state(self):
+        """Seed the quote cache, fan-out and synced command hash from the last snapshot"""
+        if self.state_store is None:
+            return
+        snapshot = self.state_store.load()
+        
+        for name, data in snapshot.get('quotes', {}).items():
+            if name not in self.quote_cache.states:
+                continue
+            try:
+                quote = decode_quote(data)
+                self.quote_cache.states[name].record(quote)
+                self.history.record({name: quote})
+            except (KeyError, ValueError, TypeError) as e:
+                logger.error(f"Ignoring saved quote for {name}: {e}")
+                
+        for guild_id, nickname in snapshot.get('applied', {}).items():
+            self.fanout.applied[int(guild_id)] = nickname
+            
+        self.synced_command_signature = snapshot.get('command_signature')
+        
+        if self.current_price is not None:
+            logger.info(
+                f"Restored {self.primary_symbol} quote ${self.current_price['price']:.2f} "
+                f"({self.quote_age:.0f}s old) and nicknames for {len(self.fanout.applied)} guilds"
+            )
+
+    async def save_state(self):
+        """Write the current quotes and applied nicknames to the snapshot off the event loop"""
+        if self.state_store is None:
+            return
+        # One save at a time, each copying the state once it holds the lock, so
+        # a snapshot taken earlier can never be the one that lands last
+        async with self.state_lock:
+            # Copy on the loop thread; the fan-out keeps mutating applied while the file is written
+            quotes = {name: state.quote for name, state in self.quote_cache.states.items() if state.quote is not None}
+            applied = dict(self.fanout.applied)
+            await asyncio.to_thread(self.state_store.save, quotes, applied, self.synced_command_signature)
+
+    def warm_start_delay(self):
+        """Seconds until the first fetch: 0 unless every restored quote is still fresh"""
+        ages = [self.quote_cache.age(name) for name in self.symbols.names]
+        if any(age is None or age > self.quote_cache.ttl for age in ages):
+            return 0.0
+        return self.quote_cache.ttl - max(ages)
+
+    async def setup_hook(self):
+        """Create the HTTP session, start the quote prefetch and metrics server before connecting to the gateway"""
+        connector = aiohttp.TCPConnector(
+            limit=self.http_pool_size,
+            ttl_dns_cache=300,
+            keepalive_timeout=self.update_interval * 60 + 30
+        )
+        self.quote_session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.http_timeout)
+        )
+        logger.info(f"Created quote HTTP session (pool size: {self.http_pool_size})")
+        
+        if self.prefetch_on_start and self.warm_start_delay() == 0:
+            calls = self.quote_client.calls_per_cycle(self.symbols)
+            if self.quota_scheduler and not self.quota_scheduler.budget.can_spend(calls):
+                logger.info("API budget too low to prefetch quotes at startup")
+            else:
+                self.prefetch_task = asyncio.create_task(self.prefetch_quotes())
+                
+        if self.tick_stream is not None:
+            self.stream_task = asyncio.create_task(self.tick_stream.run())
+            
+        if self.sync_commands_enabled:
+            # In the background so a slow sync never delays login
+            self.sync_task = asyncio.create_task(self.sync_commands())
+            
+        if self.metrics_port:
+            try:
+                self.metrics_runner = await metrics.start_metrics_server(self.metrics_port, self.metrics_host)
+            except OSError as e:
+                logger.error(f"Could not start metrics server on port {self.metrics_port}: {e}")
 
     async def on_ready(self):
         """Called when the bot is ready and connected to Discord"""
@@ -51,10 +274,74 @@ class MSTRTickerBot(discord.Client):
             logger.info(f'Bot logged in as {self.user} (ID: {self.user.id})')
         logger.info(f'Connected to {len(self.guilds)} guilds')
         
-        # Start the price update task
-        if not self.update_price_task.is_running():
-            self.update_price_task.start()
-            logger.info(f'Started price update task with {self.update_interval} minute intervals')
+        self.member_index.rebuild(self.guilds)
+        if len(self.member_index) < len(self.guilds):
+            logger.warning(f'Bot member missing from {len(self.guilds) - len(self.member_index)} guilds')
+        
+        # Start the scheduled jobs (on_ready can fire again after reconnects)
+        self.scheduler.start()
+        if not self.scheduler.is_scheduled('quote_refresh'):
+            # A pending prefetch is consumed by the first cycle straight away, even
+            # if it already finished and made the cache look fresh
+            delay = 0.0 if self.prefetch_task is not None else self.warm_start_delay()
+            self.scheduler.schedule('quote_refresh', self.update_price_cycle, delay)
+            logger.info(f'Started price updates with {self.update_interval} minute base interval')
+            if delay > 0:
+                # Restored quotes are still fresh: show them now and fetch when they expire
+                logger.info(f'Restored quotes are fresh, first fetch in {delay:.0f}s')
+                self.scheduler.schedule('reconcile', self.reconcile_nicknames)
+        if self.reconcile_interval > 0 and not self.scheduler.is_scheduled('reconcile'):
+            self.scheduler.schedule('reconcile', self.reconcile_nicknames, self.reconcile_interval)
+        if self.tick_stream is not None and self.debounce_task is None:
+            self.debounce_task = asyncio.create_task(self.stream_debouncer.run())
+            logger.info(f'Applying streamed ticks at most every {self.stream_debouncer.min_interval:.0f}s')
+
+    async def on_guild_join(self, guild):
+        """Called when the bot joins a guild: index it and show the current price there"""
+        logger.info(f'Joined guild: {guild.name}')
+        if self.member_index.add(guild):
+            await self.show_current_nickname(self.member_index.get(guild.id))
+
+    async def on_guild_available(self, guild):
+        """Called when a guild becomes available again after an outage"""
+        self.member_index.add(guild)
+
+    async def on_guild_unavailable(self, guild):
+        """Called when a guild becomes unavailable"""
+        self.member_index.remove(guild.id)
+
+    async def on_guild_remove(self, guild):
+        """Called when the bot leaves or is removed from a guild"""
+        self.member_index.remove(guild.id)
+        self.fanout.forget(guild.id)
+
+    async def on_member_update(self, before, after):
+        """Keep the index pointing at the bot's latest Member object"""
+        if self.user and after.id == self.user.id:
+            self.member_index.update(after)
+            if before.roles != after.roles:
+                await self.check_nickname_permission(after)
+
+    async def on_guild_role_update(self, before, after):
+        """A permission change on one of the bot's roles may lift a nickname quarantine"""
+        member = self.member_index.get(after.guild.id)
+        if member is not None and before.permissions != after.permissions and after in member.roles:
+            await self.check_nickname_permission(member)
+
+    async def check_nickname_permission(self, member):
+        """Release a quarantined guild as soon as the bot may change its nickname there"""
+        permissions = member.guild_permissions
+        if not (permissions.change_nickname or permissions.manage_nicknames):
+            return
+        if self.fanout.release(member.guild.id):
+            logger.info(f'Nickname permission granted in guild {member.guild.name}, lifted quarantine')
+            await self.show_current_nickname(member)
+
+    async def show_current_nickname(self, member):
+        """Apply the current nickname in a single guild"""
+        nickname = self.current_nickname()
+        if nickname is not None and self.display_mode != 'presence':
+            await self.fanout.run([member], nickname)
 
     async def on_disconnect(self):
         """Called when the bot disconnects"""
@@ -64,69 +351,81 @@ class MSTRTickerBot(discord.Client):
         """Called when the bot resumes connection"""
         logger.info('Bot resumed connection to Discord')
 
-    def fetch_mstr_price(self):
-        """Fetch MSTR stock price from Alpha Vantage API"""
+    async def load_quotes(self, names):
+        """Fetch quotes from the provider; used by the quote cache to refresh entries"""
+        symbols = [self.symbols.get(name) for name in names]
+        start = time.perf_counter()
+        quotes = await self.quote_client.fetch_quotes(self.quote_session, symbols)
+        metrics.QUOTE_FETCH_LATENCY.observe(time.perf_counter() - start)
+        self.history.record(quotes)
+        
+        for price_data in quotes.values():
+            logger.info(f"Fetched {price_data['symbol']} price: ${price_data['price']:.2f} (Change: {price_data['change']:+.2f})")
+        return quotes
+
+    async def prefetch_quotes(self):
+        """Fetch quotes while the gateway connects; returns (quotes, API calls spent)"""
+        logger.info(f"Prefetching prices for {', '.join(self.symbols.names)} during gateway connect...")
+        calls_before = self.api_call_count
+        quotes = await self.fetch_quotes()
+        return quotes, self.api_call_count - calls_before
+
+    async def sync_commands(self):
+        """Sync slash commands with Discord, skipping the call when nothing changed since the last sync"""
+        signature = command_signature(self.tree)
+        if signature == self.synced_command_signature:
+            logger.info("Slash commands unchanged since last sync, skipping")
+            return
         try:
-            # Alpha Vantage Global Quote endpoint
-            url = 'https://www.alphavantage.co/query'
-            params = {
-                'function': 'GLOBAL_QUOTE',
-                'symbol': 'MSTR',
-                'apikey': self.alpha_vantage_key
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            self.api_call_count += 1
-            
-            # Check for API errors
-            if 'Error Message' in data:
-                logger.error(f"API Error: {data['Error Message']}")
-                return None
-                
-            if 'Note' in data:
-                logger.warning(f"API Limit Warning: {data['Note']}")
-                return None
-            
-            # Extract price from response
-            global_quote = data.get('Global Quote', {})
-            if not global_quote:
-                logger.error("No Global Quote data in API response")
-                return None
-                
-            price_str = global_quote.get('05. price')
-            if not price_str:
-                logger.error("No price data in API response")
-                return None
-                
-            price = float(price_str)
-            change_str = global_quote.get('09. change', '0')
-            change = float(change_str)
-            
-            logger.info(f"Fetched MSTR price: ${price:.2f} (Change: {change:+.2f})")
-            return {
-                'price': price,
-                'change': change,
-                'timestamp': datetime.now()
-            }
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Network error fetching MSTR price: {e}")
-            return None
-        except (KeyError, ValueError, TypeError) as e:
-            logger.error(f"Error parsing MSTR price data: {e}")
-            return None
-        except Exception as e:
-            logger.error(f"Unexpected error fetching MSTR price: {e}")
-            return None
+            synced = await self.tree.sync()
+        except discord.HTTPException as e:
+            logger.error(f"Failed to sync slash commands: {e}")
+            return
+        self.synced_command_signature = signature
+        await self.save_state()
+        logger.info(f"Synced {len(synced)} slash commands")
+
+    async def fetch_quotes(self):
+        """Refresh every tracked symbol through the cache and return the fetched quotes"""
+        return await self.quote_cache.refresh(self.symbols.names)
+
+    async def get_quote(self, symbol):
+        """Read a quote from the cache, refreshing it only if it is past its TTL"""
+        return await self.quote_cache.get(symbol.upper())
+
+    async def apply_ticks(self):
+        """Debounced: fold the newest streamed ticks into the quote cache and update the nickname"""
+        quotes = {}
+        for name, tick in self.tick_slot.take().items():
+            previous = self.quote_cache.peek(name)
+            change = tick['change']
+            if change is None:
+                # Keep measuring from the previous close implied by the last quote
+                change = tick['price'] - (previous['price'] - previous['change']) if previous else 0.0
+            quote = make_quote(name, tick['price'], change, tick['volume'], tick['timestamp'])
+            self.quote_cache.states[name].record(quote)
+            quotes[name] = quote
+        self.history.record(quotes)
+        
+        price_data = quotes.get(self.primary_symbol)
+        if price_data:
+            await self.update_display(self.format_price_nickname(price_data))
+            await self.save_state()
+
+    def current_nickname(self):
+        """The text last shown, or the restored quote's before the first update"""
+        if self.display_text is not None:
+            return self.display_text
+        if self.current_price is not None:
+            return self.format_price_nickname(self.current_price)
+        return None
 
     def format_price_nickname(self, price_data):
         """Format the price data into a nickname string"""
         if not price_data:
-            return "MSTR: Error"
+            return f"{self.primary_symbol}: Error"
             
+        symbol = price_data.get('symbol', self.primary_symbol)
         price = price_data['price']
         change = price_data['change']
         
@@ -135,102 +434,301 @@ class MSTRTickerBot(discord.Client):
         change_str = f"{change:+.2f}"
         
         # Create nickname (Discord has 32 character limit)
-        nickname = f"$MSTR: ${price:.2f} {change_symbol}"
+        nickname = f"${symbol}: ${price:.2f} {change_symbol}"
         
         # Ensure nickname fits Discord's limit
         if len(nickname) > 32:
-            nickname = f"MSTR: ${price:.2f}"
+            nickname = f"{symbol}: ${price:.2f}"
             
         return nickname
 
+    async def update_display(self, text):
+        """Show text as the nickname, the presence or both; returns the guilds showing it"""
+        self.display_text = text
+        in_sync = 0
+        if self.display_mode in ('presence', 'both') and await self.update_presence(text):
+            in_sync = len(self.guilds)
+        if self.display_mode in ('nickname', 'both'):
+            in_sync = await self.update_nickname_in_guilds(text)
+        return in_sync
+
+    def make_activity(self, text):
+        if self.presence_activity == 'custom':
+            return discord.CustomActivity(name=text)
+        activity_type = getattr(discord.ActivityType, self.presence_activity, discord.ActivityType.watching)
+        return discord.Activity(type=activity_type, name=text)
+
+    async def update_presence(self, text):
+        """Show text as the bot's activity in every guild with one gateway op per shard"""
+        if text == self.presence_text:
+            return True
+        try:
+            await self.change_presence(activity=self.make_activity(text))
+        except Exception as e:
+            logger.error(f"Failed to update presence: {e}")
+            return False
+        self.presence_text = text
+        self.presence_updates += 1
+        logger.info(f"Updated presence: {text}")
+        return True
+
     async def update_nickname_in_guilds(self, nickname):
         """Update bot nickname in all guilds"""
-        updated_guilds = 0
-        
-        for guild in self.guilds:
-            try:
-                # Get bot member in this guild
-                if self.user:
-                    member = guild.get_member(self.user.id)
-                else:
-                    continue
-                    
-                if member:
-                    await member.edit(nick=nickname)
-                    updated_guilds += 1
-                    logger.debug(f"Updated nickname in guild: {guild.name}")
-                else:
-                    logger.warning(f"Bot not found as member in guild: {guild.name}")
-                    
-            except discord.Forbidden:
-                logger.warning(f"No permission to change nickname in guild: {guild.name}")
-            except discord.HTTPException as e:
-                logger.error(f"HTTP error updating nickname in guild {guild.name}: {e}")
-            except Exception as e:
-                logger.error(f"Unexpected error updating nickname in guild {guild.name}: {e}")
-                
-        logger.info(f"Updated nickname in {updated_guilds}/{len(self.guilds)} guilds")
-        return updated_guilds
+        if not self.user:
+            return 0
+            
+        stats = await self.fanout.run(self.member_index, nickname)
+        self.last_fanout_stats = stats
+        self.log_fanout_stats(stats)
+        return stats.in_sync
+
+    def log_fanout_stats(self, stats, prefix=''):
+        """Log the outcome of a nickname fan-out"""
+        logger.info(
+            f"{prefix}Updated nickname in {stats.updated}/{stats.total} guilds in {stats.duration:.2f}s "
+            f"({stats.edits_per_sec:.1f} edits/sec, {stats.skipped} unchanged, {stats.forbidden} forbidden, "
+            f"{stats.rate_limited} rate limited, {stats.coalesced} coalesced, {stats.quarantined} quarantined, "
+            f"{stats.failed} failed)"
+        )
+        logger.debug(
+            f"Nickname edits applied: {self.fanout.applied_count}, "
+            f"skipped as unchanged: {self.fanout.skipped_count}"
+        )
 
-    @tasks.loop(minutes=1)
-    async def update_price_task(self):
-        """Periodic task to update MSTR price and bot nickname"""
+    async def update_price_cycle(self):
+        """Scheduled job: refresh quotes and the bot nickname; returns seconds until the next run"""
+        start = time.perf_counter()
         try:
-            # Check if it's time to update (respect the configured interval)
-            if (self.last_update is None or 
-                (datetime.now() - self.last_update).total_seconds() >= self.update_interval * 60):
+            calls = self.quote_client.calls_per_cycle(self.symbols)
+            if self.prefetch_task is not None:
+                # First cycle after startup: use the fetch started in setup_hook
+                prefetch, self.prefetch_task = self.prefetch_task, None
+                quotes, spent = await prefetch
+            elif self.tick_stream is not None and self.tick_stream.live and self.quote_cache.status(self.primary_symbol) == 'fresh':
+                # Streamed ticks keep the quote fresh; polling is only the fallback
+                logger.debug(f"Tick stream live ({self.tick_stream.ticks} ticks), skipping quote fetch")
+                return self.update_interval * 60
+            else:
+                if self.quota_scheduler and not self.quota_scheduler.budget.can_spend(calls):
+                    budget = self.quota_scheduler.budget
+                    logger.warning(
+                        f"API budget too low for {calls} calls ({budget.remaining_today} left today, "
+                        f"{budget.remaining_this_minute} this minute), postponing fetch"
+                    )
+                    return self.next_fetch_delay(calls, succeeded=False)
+                    
+                logger.info(f"Fetching updated prices for {', '.join(self.symbols.names)}...")
                 
-                logger.info("Fetching updated MSTR price...")
+                # Fetch new price data for all symbols in one batch
+                calls_before = self.api_call_count
+                quotes = await self.fetch_quotes()
+                spent = self.api_call_count - calls_before
                 
-                # Fetch new price data
-                price_data = self.fetch_mstr_price()
+            price_data = quotes.get(self.primary_symbol)
+            delay = self.next_fetch_delay(calls, spent=spent, succeeded=bool(price_data))
+            if self.quota_scheduler:
+                await self.quota_scheduler.budget.persist()
+            
+            if price_data:
+                # Format and update nickname
+                nickname = self.format_price_nickname(price_data)
+                updated_count = await self.update_display(nickname)
                 
-                if price_data:
-                    self.current_price = price_data
-                    self.last_update = datetime.now()
-                    
-                    # Format and update nickname
-                    nickname = self.format_price_nickname(price_data)
-                    updated_count = await self.update_nickname_in_guilds(nickname)
+                if updated_count > 0:
+                    logger.info(f"Successfully updated price display: {nickname}")
+                else:
+                    logger.warning("Failed to update nickname in any guilds")
+                await self.save_state()
                     
-                    if updated_count > 0:
-                        logger.info(f"Successfully updated price display: {nickname}")
-                    else:
-                        logger.warning("Failed to update nickname in any guilds")
-                        
+            else:
+                if self.quote_cache.usable(self.primary_symbol) is not None:
+                    logger.error(f"Failed to fetch price data, keeping previous nickname (quote age: {self.quote_age:.0f}s)")
                 else:
-                    logger.error("Failed to fetch price data, keeping previous nickname")
+                    # No previous price data, or it is past the stale-if-error window: show error state
+                    if self.current_price is not None:
+                        logger.error(f"Failed to fetch price data and the cached quote is too old to show ({self.quote_age:.0f}s)")
+                    else:
+                        logger.error("Failed to fetch price data and no previous quote is cached")
+                    error_nickname = f"{self.primary_symbol}: API Error"
+                    await self.update_display(error_nickname)
                     
-                    # If we have no previous price data, show error state
-                    if self.current_price is None:
-                        error_nickname = "MSTR: API Error"
-                        await self.update_nickname_in_guilds(error_nickname)
-                        
+            return delay
+            
         except Exception as e:
             logger.error(f"Error in price update task: {e}")
+            return self.retry_interval
+        finally:
+            metrics.CYCLE_DURATION.observe(time.perf_counter() - start)
+
+    def next_fetch_delay(self, calls_per_cycle, spent=0, succeeded=True):
+        """Record API spend and return the seconds until the next quote fetch"""
+        if self.quota_scheduler is None:
+            # Fixed interval; retry sooner after a failure
+            interval = self.update_interval * 60 if succeeded else self.retry_interval
+        else:
+            budget = self.quota_scheduler.budget
+            budget.record(spent)
+            interval = self.quota_scheduler.next_interval(calls_per_cycle)
+            logger.info(
+                f"API budget: {budget.used_today}/{budget.per_day} calls used today, "
+                f"next fetch in {interval / 60:.1f} min, "
+                f"forecast {self.quota_scheduler.forecast(calls_per_cycle)} calls left at end of day"
+            )
+            
+        if self.market_calendar is not None:
+            # Failed and postponed fetches follow the calendar too, so a retry
+            # outside the session waits for the next window rather than for
+            # the scheduler's budget reset. Market hours are wall-clock based;
+            # convert the result back to a delay
+            now = datetime.now()
+            next_at = self.market_calendar.next_fetch_time(now, now + timedelta(seconds=interval))
+            if (next_at - now).total_seconds() > interval:
+                logger.info(f"Market closed, sleeping until next session at {next_at:%Y-%m-%d %H:%M}")
+            interval = max(0.0, (next_at - now).total_seconds())
+        return interval
 
-    @update_price_task.before_loop
-    async def before_update_price_task(self):
-        """Wait for bot to be ready before starting the update task"""
-        await self.wait_until_ready()
+    async def reconcile_nicknames(self):
+        """Scheduled job: re-apply the current nickname so drifted guilds get repaired"""
+        nickname = self.current_nickname()
+        if nickname is not None:
+            await self.update_display(nickname)
+            await self.save_state()
+        await self.revalidate_quotes()
+        return self.reconcile_interval if self.reconcile_interval > 0 else None
+
+    async def revalidate_quotes(self):
+        """Refresh quotes in their stale-while-revalidate window after they were shown.
+
+        Skipped while another refresh is in flight, outside the trading
+        window and when the API budget can't cover it.
+        """
+        stale = [name for name in self.symbols.names if self.quote_cache.status(name) == 'stale']
+        if not stale or self.quote_cache.refreshing:
+            return
+        if self.market_calendar is not None and self.market_calendar.current_window(datetime.now()) is None:
+            return
+        calls = self.quote_client.calls_per_cycle([self.symbols.get(name) for name in stale])
+        if self.quota_scheduler and not self.quota_scheduler.budget.can_spend(calls):
+            return
+            
+        logger.info(f"Revalidating stale quotes for {', '.join(stale)}")
+        self.quote_cache.stale_hits += len(stale)
+        calls_before = self.api_call_count
+        quotes = await self.quote_cache.refresh(stale)
+        if self.quota_scheduler:
+            self.quota_scheduler.budget.record(self.api_call_count - calls_before)
+            await self.quota_scheduler.budget.persist()
+        price_data = quotes.get(self.primary_symbol)
+        if price_data:
+            await self.update_display(self.format_price_nickname(price_data))
+            await self.save_state()
 
     async def close(self):
         """Clean shutdown of the bot"""
         logger.info("Shutting down bot...")
-        if hasattr(self, 'update_price_task'):
-            self.update_price_task.cancel()
+        await self.scheduler.stop()
+        for task in (self.prefetch_task, self.sync_task, self.stream_task, self.debounce_task):
+            if task is not None and not task.done():
+                task.cancel()
+        self.quote_cache.cancel()
+        self.fanout.close()
+        await self.save_state()
+        if self.quota_scheduler:
+            await self.quota_scheduler.budget.persist()
+        if self.metrics_runner is not None:
+            await self.metrics_runner.cleanup()
+        if self.quote_session is not None and not self.quote_session.closed:
+            await self.quote_session.close()
         await super().close()
 
+class ShardedMSTRTickerBot(MSTRTickerBot, discord.AutoShardedClient):
+    """Sharded variant of the bot.
+
+    A single quote fetch per cycle feeds every shard; the nickname fan-out
+    then runs one worker per shard over only that shard's guilds.
+    """
+
+    def __init__(self, shard_count=None, shard_ids=None):
+        options = {}
+        if shard_count is not None:
+            options['shard_count'] = shard_count
+        if shard_ids is not None:
+            if shard_count is None:
+                raise ValueError("SHARD_COUNT is required when SHARD_IDS is set")
+            options['shard_ids'] = shard_ids
+        super().__init__(**options)
+        
+        # shard_id -> FanoutStats from the most recent cycle
+        self.shard_fanout_stats = {}
+
+    async def on_shard_ready(self, shard_id):
+        """Called when a single shard has finished connecting"""
+        logger.info(f'Shard {shard_id} ready')
+
+    async def on_shard_disconnect(self, shard_id):
+        """Called when a single shard disconnects"""
+        logger.warning(f'Shard {shard_id} disconnected from Discord')
+
+    async def on_shard_resumed(self, shard_id):
+        """Called when a single shard resumes its session"""
+        logger.info(f'Shard {shard_id} resumed connection to Discord')
+
+    async def update_nickname_in_guilds(self, nickname):
+        """Update bot nickname in all guilds, one fan-out worker per shard"""
+        if not self.user:
+            return 0
+            
+        members_by_shard = {}
+        for member in self.member_index:
+            members_by_shard.setdefault(member.guild.shard_id, []).append(member)
+            
+        shard_ids = list(members_by_shard)
+        results = await asyncio.gather(*(
+            self.update_shard(shard_id, members_by_shard[shard_id], nickname)
+            for shard_id in shard_ids
+        ))
+        self.shard_fanout_stats = dict(zip(shard_ids, results))
+        
+        stats = FanoutStats.combine(results)
+        self.last_fanout_stats = stats
+        self.log_fanout_stats(stats, prefix=f"[{len(shard_ids)} shards] ")
+        return stats.in_sync
+
+    async def update_shard(self, shard_id, members, nickname):
+        """Run the nickname fan-out for the guilds owned by one shard"""
+        stats = await self.fanout.run(members, nickname)
+        
+        shard = self.get_shard(shard_id)
+        latency = f"{shard.latency * 1000:.0f}ms" if shard and math.isfinite(shard.latency) else "n/a"
+        logger.info(
+            f"Shard {shard_id}: updated {stats.updated}/{stats.total} guilds in {stats.duration:.2f}s "
+            f"({stats.edits_per_sec:.1f} edits/sec, {stats.skipped} unchanged), gateway latency {latency}"
+        )
+        return stats
+
+def create_bot():
+    """Create the plain or sharded bot depending on SHARDED"""
+    if os.getenv('SHARDED', 'false').lower() != 'true':
+        return MSTRTickerBot()
+        
+    shard_count = os.getenv('SHARD_COUNT')
+    shard_ids = os.getenv('SHARD_IDS')
+    return ShardedMSTRTickerBot(
+        shard_count=int(shard_count) if shard_count else None,
+        shard_ids=[int(i) for i in shard_ids.split(',')] if shard_ids else None
+    )
+
 def main():
     """Main function to run the bot"""
     try:
         # Create and run the bot
-        bot = MSTRTickerBot()
+        bot = create_bot()
         
         # Handle graceful shutdown
         try:
             if bot.discord_token:
-                bot.run(bot.discord_token)
+                # Logging is already configured; keep discord.py from adding its own handler
+                bot.run(bot.discord_token, log_handler=None)
             else:
                 logger.error("No Discord bot token available")
                 return 1
@@ -247,5 +745,19 @@ def main():
         
     return 0
 
+def cluster_main():
+    """Run the bot as a multi-process cluster fed by a single quote fetcher"""
+    try:
+        workers = int(os.getenv('CLUSTER_WORKERS', '2'))
+        shard_count = int(os.getenv('SHARD_COUNT', str(workers)))
+        if workers < 1 or shard_count < 1:
+            logger.error("CLUSTER_WORKERS and SHARD_COUNT must be positive")
+            return 1
+        return run_cluster(workers, shard_count)
+        
+    except Exception as e:
+        logger.error(f"Failed to run cluster: {e}")
+        return 1
+
 if __name__ == "__main__":
-    exit(main())
+    exit(cluster_main() if '--cluster' in sys.argv[1:] else main())
@@ -0,0 +1,175 @@
+import logging
+import os
+from datetime import date, datetime, time as dtime, timedelta
+
+from quota import EASTERN, MARKET_CLOSE, MARKET_OPEN
+
+logger = logging.getLogger(__name__)
+
+EARLY_CLOSE = dtime(13, 0)
+PRE_MARKET_OPEN = dtime(4, 0)
+POST_MARKET_CLOSE = dtime(20, 0)
+EARLY_POST_MARKET_CLOSE = dtime(17, 0)
+
+# Years covered by the precomputed holiday table
+FIRST_YEAR = 2020
+LAST_YEAR = 2040
+
+
+def _easter(year):
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year, month, weekday, n):
+    """The n-th given weekday of a month (n=-1 for the last one)"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year, month + 1, 1) - timedelta(days=1) if month < 12 else date(year, 12, 31)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day):
+    """Saturday holidays move to Friday, Sunday holidays to Monday"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def _nyse_holidays(year):
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),            # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),            # Washington's Birthday
+        _easter(year) - timedelta(days=2),      # Good Friday
+        _nth_weekday(year, 5, 0, -1),           # Memorial Day
+        _observed(date(year, 7, 4)),            # Independence Day
+        _nth_weekday(year, 9, 0, 1),            # Labor Day
+        _nth_weekday(year, 11, 3, 4),           # Thanksgiving
+        _observed(date(year, 12, 25)),          # Christmas
+    }
+    # New Year's Day on a Saturday is not observed on the prior Friday
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return holidays
+
+
+def _nyse_early_closes(year, holidays):
+    candidates = {
+        date(year, 7, 3),                                   # Day before Independence Day
+        _nth_weekday(year, 11, 3, 4) + timedelta(days=1),   # Day after Thanksgiving
+        date(year, 12, 24),                                 # Christmas Eve
+    }
+    return {d for d in candidates if d.weekday() < 5 and d not in holidays}
+
+
+HOLIDAYS = frozenset(d for y in range(FIRST_YEAR, LAST_YEAR + 1) for d in _nyse_holidays(y))
+EARLY_CLOSES = frozenset(
+    d for y in range(FIRST_YEAR, LAST_YEAR + 1) for d in _nyse_early_closes(y, HOLIDAYS)
+)
+
+
+class MarketCalendar:
+    """NYSE trading calendar: regular hours, early closes and holidays.
+
+    With extended hours enabled, the trading window runs from the pre-market
+    open to the post-market close instead of the regular session.
+    """
+
+    def __init__(self, extended_hours=False, post_close_delay=60):
+        self.extended_hours = extended_hours
+        self.post_close_delay = timedelta(seconds=post_close_delay)
+
+    def is_trading_day(self, day):
+        return day.weekday() < 5 and day not in HOLIDAYS
+
+    def regular_session(self, now):
+        """Return the day's regular (open, close) as Eastern datetimes, or None when closed"""
+        day = now.astimezone(EASTERN).date()
+        if not self.is_trading_day(day):
+            return None
+        close = EARLY_CLOSE if day in EARLY_CLOSES else MARKET_CLOSE
+        return (
+            datetime.combine(day, MARKET_OPEN, tzinfo=EASTERN),
+            datetime.combine(day, close, tzinfo=EASTERN)
+        )
+
+    def window(self, day):
+        """The (start, end) the bot should fetch in on a day, or None"""
+        if not self.is_trading_day(day):
+            return None
+        if self.extended_hours:
+            end = EARLY_POST_MARKET_CLOSE if day in EARLY_CLOSES else POST_MARKET_CLOSE
+            return (
+                datetime.combine(day, PRE_MARKET_OPEN, tzinfo=EASTERN),
+                datetime.combine(day, end, tzinfo=EASTERN)
+            )
+        return self.regular_session(datetime.combine(day, dtime(12), tzinfo=EASTERN))
+
+    def current_window(self, now):
+        """The trading window containing now, or None"""
+        now = now.astimezone(EASTERN)
+        bounds = self.window(now.date())
+        if bounds and bounds[0] <= now < bounds[1]:
+            return bounds
+        return None
+
+    def next_window_start(self, now):
+        """Start of the next trading window after now"""
+        now = now.astimezone(EASTERN)
+        day = now.date()
+        for _ in range(14):
+            bounds = self.window(day)
+            if bounds and bounds[0] > now:
+                return bounds[0]
+            day += timedelta(days=1)
+        # Past the holiday table; fall back to the next weekday
+        while day.weekday() >= 5:
+            day += timedelta(days=1)
+        return datetime.combine(day, PRE_MARKET_OPEN if self.extended_hours else MARKET_OPEN, tzinfo=EASTERN)
+
+    def next_fetch_time(self, now, proposed):
+        """Adjust a proposed next fetch time to the trading calendar.
+
+        During a window, a fetch that would land after the close is pulled
+        in to one final fetch just after it. Outside a window (including
+        right after that final fetch) the next fetch waits for the next
+        window to open. Times are returned as naive local datetimes, like
+        the ones passed in.
+        """
+        now_et = now.astimezone(EASTERN)
+        bounds = self.current_window(now_et)
+        if bounds is None:
+            next_at = self.next_window_start(now_et)
+        else:
+            final_fetch = bounds[1] + self.post_close_delay
+            next_at = min(proposed.astimezone(EASTERN), final_fetch)
+        return next_at.astimezone().replace(tzinfo=None)
+
+
+def market_calendar_from_env(symbols):
+    """Build the calendar unless it is disabled or a 24/7 crypto symbol is tracked"""
+    if os.getenv('MARKET_CALENDAR', 'true').lower() != 'true':
+        return None
+    if any(symbol.kind == 'crypto' for symbol in symbols):
+        logger.info("Crypto symbols trade around the clock, market calendar disabled")
+        return None
+    return MarketCalendar(
+        extended_hours=os.getenv('EXTENDED_HOURS', 'false').lower() == 'true',
+        post_close_delay=float(os.getenv('POST_CLOSE_FETCH_DELAY_SECONDS', '60'))
+    )
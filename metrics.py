@@ -0,0 +1,161 @@
+import logging
+import math
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_value(value):
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonically increasing value, optionally read from a callback"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, function=None):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def set_function(self, function):
+        self.function = function
+
+    def samples(self):
+        value = self.function() if self.function else self.value
+        yield self.name, '', value
+
+
+class Gauge(Counter):
+    """Value that can go up and down, optionally read from a callback"""
+
+    kind = 'gauge'
+
+    def set(self, value):
+        self.value = value
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+class Histogram:
+    """Cumulative bucketed histogram of observed values"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{self.name}_bucket', f'{{le="{_format_value(bound)}"}}', cumulative
+        yield f'{self.name}_sum', '', self.sum
+        yield f'{self.name}_count', '', self.count
+
+
+class Registry:
+    """Holds metrics and renders them in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            try:
+                for name, labels, value in metric.samples():
+                    lines.append(f'{name}{labels} {_format_value(value)}')
+            except Exception as e:
+                logger.error(f"Error collecting metric {metric.name}: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+QUOTE_FETCH_LATENCY = REGISTRY.register(Histogram(
+    'mstr_bot_quote_fetch_seconds', 'Latency of quote fetches from the provider chain'))
+MEMBER_EDIT_LATENCY = REGISTRY.register(Histogram(
+    'mstr_bot_member_edit_seconds', 'Latency of a single member.edit nickname call'))
+CYCLE_DURATION = REGISTRY.register(Histogram(
+    'mstr_bot_update_cycle_seconds', 'Duration of a full quote refresh and nickname update cycle'))
+INTERACTION_LATENCY = REGISTRY.register(Histogram(
+    'mstr_bot_interaction_seconds', 'Time from slash command invocation to the response being sent'))
+
+API_CALLS = REGISTRY.register(Counter(
+    'mstr_bot_api_calls_total', 'Quote provider API calls made'))
+RATE_LIMITED = REGISTRY.register(Counter(
+    'mstr_bot_discord_rate_limited_total', 'Discord 429 responses seen by the nickname fan-out'))
+FORBIDDEN = REGISTRY.register(Counter(
+    'mstr_bot_forbidden_guilds_total', 'Nickname edits rejected with Forbidden'))
+SKIPPED_EDITS = REGISTRY.register(Counter(
+    'mstr_bot_skipped_edits_total', 'Nickname edits skipped because the guild already showed the nickname'))
+APPLIED_EDITS = REGISTRY.register(Counter(
+    'mstr_bot_applied_edits_total', 'Nickname edits applied'))
+CIRCUIT_TRANSITIONS = REGISTRY.register(Counter(
+    'mstr_bot_circuit_transitions_total', 'Quote provider circuit breaker state changes'))
+CIRCUIT_REJECTED = REGISTRY.register(Counter(
+    'mstr_bot_circuit_rejected_total', 'Quote fetches skipped because the provider circuit was open'))
+
+QUOTE_AGE = REGISTRY.register(Gauge(
+    'mstr_bot_quote_age_seconds', 'Age of the quote shown in the nickname'))
+GUILDS = REGISTRY.register(Gauge(
+    'mstr_bot_guilds', 'Guilds the bot is a member of'))
+QUARANTINED_GUILDS = REGISTRY.register(Gauge(
+    'mstr_bot_quarantined_guilds', 'Guilds left out of the nickname fan-out after Forbidden responses'))
+CIRCUITS_OPEN = REGISTRY.register(Gauge(
+    'mstr_bot_circuits_open', 'Quote provider circuits currently open or half-open'))
+API_BUDGET_REMAINING = REGISTRY.register(Gauge(
+    'mstr_bot_api_budget_remaining', "Provider API calls left in today's budget"))
+API_BUDGET_FORECAST = REGISTRY.register(Gauge(
+    'mstr_bot_api_budget_forecast', 'Provider API calls expected to be left at the end of the day'))
+
+
+async def _handle_metrics(request):
+    return web.Response(
+        text=REGISTRY.render(),
+        headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+    )
+
+
+async def start_metrics_server(port, host='127.0.0.1'):
+    """Serve /metrics on the running event loop; returns the runner to clean up"""
+    app = web.Application()
+    app.router.add_get('/metrics', _handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return runner
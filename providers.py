@@ -0,0 +1,416 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+
+import aiohttp
+
+from circuit import CircuitBreaker
+from quotes import make_quote
+
+logger = logging.getLogger(__name__)
+
+ALPHA_VANTAGE_URL = 'https://www.alphavantage.co/query'
+
+# REALTIME_BULK_QUOTES accepts at most this many symbols per request
+BULK_QUOTE_LIMIT = 100
+
+
+class QuoteProvider:
+    """Base class for price sources.
+
+    fetch_quotes() takes TickerSymbols and returns {name: price_data} for
+    the symbols it could fetch; anything missing from the result is treated
+    as a failure for that symbol (errors, rate-limit notes, bad payloads).
+    call_count counts calls that spend an API quota; sources without one
+    leave it at 0 so they never eat into the QuotaBudget.
+    """
+
+    name = 'provider'
+    call_count = 0
+
+    def calls_per_cycle(self, symbols):
+        """Number of upstream calls one fetch of these symbols costs"""
+        return len(list(symbols))
+
+    async def fetch_quotes(self, session, symbols):
+        raise NotImplementedError
+
+
+class AlphaVantageProvider(QuoteProvider):
+    """Alpha Vantage quotes, fetched with as few HTTP calls as possible.
+
+    With bulk enabled, equities are requested through REALTIME_BULK_QUOTES
+    in chunks of up to 100 symbols. Otherwise each equity costs one
+    GLOBAL_QUOTE call, issued concurrently over the shared session. Crypto
+    has no bulk endpoint and always costs one CURRENCY_EXCHANGE_RATE call.
+    """
+
+    name = 'alphavantage'
+
+    def __init__(self, api_key, base_url=ALPHA_VANTAGE_URL, bulk=False):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.bulk = bulk
+
+    def calls_per_cycle(self, symbols):
+        """Number of HTTP calls one fetch of these symbols costs"""
+        equities = sum(1 for s in symbols if s.kind == 'equity')
+        crypto = sum(1 for s in symbols if s.kind == 'crypto')
+        if self.bulk:
+            equities = -(-equities // BULK_QUOTE_LIMIT)
+        return equities + crypto
+
+    async def fetch_quotes(self, session, symbols):
+        """Fetch quotes for symbols, returning {name: price_data} for successes"""
+        symbols = list(symbols)
+        equities = [s.name for s in symbols if s.kind == 'equity']
+        calls = []
+
+        if self.bulk and equities:
+            for i in range(0, len(equities), BULK_QUOTE_LIMIT):
+                calls.append(self._fetch_bulk(session, equities[i:i + BULK_QUOTE_LIMIT]))
+        else:
+            calls.extend(self._fetch_global_quote(session, name) for name in equities)
+        calls.extend(self._fetch_crypto(session, s.name) for s in symbols if s.kind == 'crypto')
+
+        quotes = {}
+        for result in await asyncio.gather(*calls):
+            if result:
+                quotes.update(result)
+        return quotes
+
+    async def _query(self, session, label, params):
+        """Run one Alpha Vantage query, returning the JSON body or None on failure"""
+        if session is None or session.closed:
+            logger.error("Quote HTTP session is not available")
+            return None
+
+        try:
+            async with session.get(self.base_url, params={**params, 'apikey': self.api_key}) as response:
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+            self.call_count += 1
+
+            # Check for API errors
+            if 'Error Message' in data:
+                logger.error(f"API Error for {label}: {data['Error Message']}")
+                return None
+
+            if 'Note' in data or 'Information' in data:
+                logger.warning(f"API Limit Warning: {data.get('Note') or data.get('Information')}")
+                return None
+
+            return data
+
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out fetching {label} price")
+            return None
+        except aiohttp.ClientError as e:
+            logger.error(f"Network error fetching {label} price: {e}")
+            return None
+        except ValueError as e:
+            logger.error(f"Invalid JSON in {label} response: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error fetching {label} price: {e}")
+            return None
+
+    async def _fetch_global_quote(self, session, name):
+        data = await self._query(session, name, {'function': 'GLOBAL_QUOTE', 'symbol': name})
+        if data is None:
+            return None
+
+        try:
+            # Extract price from response
+            global_quote = data.get('Global Quote', {})
+            if not global_quote:
+                logger.error(f"No Global Quote data in API response for {name}")
+                return None
+
+            price_str = global_quote.get('05. price')
+            if not price_str:
+                logger.error(f"No price data in API response for {name}")
+                return None
+
+            quote = make_quote(
+                name,
+                price=float(price_str),
+                change=float(global_quote.get('09. change', '0')),
+                volume=float(global_quote.get('06. volume', '0'))
+            )
+            return {name: quote}
+
+        except (KeyError, ValueError, TypeError) as e:
+            logger.error(f"Error parsing {name} price data: {e}")
+            return None
+
+    async def _fetch_bulk(self, session, names):
+        label = ','.join(names)
+        data = await self._query(session, label, {'function': 'REALTIME_BULK_QUOTES', 'symbol': label})
+        if data is None:
+            return None
+
+        quotes = {}
+        for row in data.get('data', []):
+            try:
+                name = row['symbol'].upper()
+                quotes[name] = make_quote(
+                    name,
+                    price=float(row['close']),
+                    change=float(row.get('change') or 0),
+                    volume=float(row.get('volume') or 0)
+                )
+            except (KeyError, ValueError, TypeError, AttributeError) as e:
+                logger.error(f"Error parsing bulk quote row {row!r}: {e}")
+
+        missing = set(names) - set(quotes)
+        if missing:
+            logger.warning(f"Bulk quote response missing symbols: {', '.join(sorted(missing))}")
+        return quotes
+
+    async def _fetch_crypto(self, session, name):
+        data = await self._query(session, name, {
+            'function': 'CURRENCY_EXCHANGE_RATE',
+            'from_currency': name,
+            'to_currency': 'USD'
+        })
+        if data is None:
+            return None
+
+        try:
+            rate = data.get('Realtime Currency Exchange Rate', {})
+            price_str = rate.get('5. Exchange Rate')
+            if not price_str:
+                logger.error(f"No exchange rate in API response for {name}")
+                return None
+            # The exchange rate endpoint carries no daily change
+            return {name: make_quote(name, price=float(price_str), change=0.0)}
+
+        except (KeyError, ValueError, TypeError) as e:
+            logger.error(f"Error parsing {name} price data: {e}")
+            return None
+
+
+
+class FileProvider(QuoteProvider):
+    """Reads quotes from a local JSON file, for offline runs and as a last-resort fallback.
+
+    The file maps symbols to objects with 'price' and optional 'change' and
+    'volume', e.g. {"MSTR": {"price": 350.1, "change": -2.4}}. It is re-read
+    on every fetch, so another process can keep it updated.
+    """
+
+    name = 'file'
+
+    def __init__(self, path):
+        self.path = path
+        # Local reads cost no API quota, so they are not counted in call_count
+        self.reads = 0
+
+    def _read(self):
+        with open(self.path, encoding='utf-8') as f:
+            return json.load(f)
+
+    async def fetch_quotes(self, session, symbols):
+        try:
+            data = await asyncio.to_thread(self._read)
+            self.reads += 1
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read quote file {self.path}: {e}")
+            return {}
+
+        quotes = {}
+        for symbol in symbols:
+            entry = data.get(symbol.name)
+            if not entry:
+                continue
+            try:
+                quotes[symbol.name] = make_quote(
+                    symbol.name,
+                    price=float(entry['price']),
+                    change=float(entry.get('change', 0)),
+                    volume=float(entry.get('volume', 0))
+                )
+            except (KeyError, ValueError, TypeError) as e:
+                logger.error(f"Error parsing {symbol.name} entry in {self.path}: {e}")
+        return quotes
+
+
+class ProviderRouter(QuoteProvider):
+    """Tries providers in order, failing over per symbol.
+
+    Symbols a provider could not return (errors or rate-limit notes) are
+    requested from the next provider. With hedging enabled, a second request
+    goes to the next provider when the primary has not answered within its
+    observed p95 latency (or `hedge_after` seconds until enough samples
+    exist), and whichever answers first wins.
+    """
+
+    name = 'router'
+    LATENCY_SAMPLES = 100
+    MIN_SAMPLES_FOR_P95 = 20
+
+    def __init__(self, providers, hedge=False, hedge_after=2.0):
+        if not providers:
+            raise ValueError("At least one quote provider is required")
+        self.providers = list(providers)
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.latencies = {p.name: deque(maxlen=self.LATENCY_SAMPLES) for p in self.providers}
+        self.failovers = 0
+        self.hedged_requests = 0
+
+    @property
+    def call_count(self):
+        """Quota-spending calls across the chain (quota-free providers report 0)"""
+        return sum(p.call_count for p in self.providers)
+
+    def calls_per_cycle(self, symbols):
+        return self.providers[0].calls_per_cycle(symbols)
+
+    def p95_latency(self, provider):
+        samples = sorted(self.latencies[provider.name])
+        if len(samples) < self.MIN_SAMPLES_FOR_P95:
+            return None
+        return samples[int(len(samples) * 0.95) - 1]
+
+    async def _timed_fetch(self, provider, session, symbols):
+        start = time.monotonic()
+        quotes = await provider.fetch_quotes(session, symbols)
+        self.latencies[provider.name].append(time.monotonic() - start)
+        return quotes
+
+    async def fetch_quotes(self, session, symbols):
+        remaining = list(symbols)
+        quotes = {}
+        index = 0
+
+        while remaining and index < len(self.providers):
+            provider = self.providers[index]
+            if index == 0 and self.hedge and len(self.providers) > 1:
+                result, index = await self._hedged_fetch(session, remaining)
+                provider = self.providers[index]
+            else:
+                result = await self._timed_fetch(provider, session, remaining)
+
+            quotes.update(result)
+            missing = [s for s in remaining if s.name not in quotes]
+            index += 1
+            if missing and index < len(self.providers):
+                self.failovers += 1
+                logger.warning(
+                    f"Provider {provider.name} returned no quote for {', '.join(s.name for s in missing)}, "
+                    f"failing over to {self.providers[index].name}"
+                )
+            remaining = missing
+
+        return quotes
+
+    async def _hedged_fetch(self, session, symbols):
+        """Query the primary, hedging to the secondary if it is slow.
+
+        Returns (quotes, index of the last provider consulted).
+        """
+        primary, secondary = self.providers[0], self.providers[1]
+        delay = self.p95_latency(primary) or self.hedge_after
+        primary_task = asyncio.create_task(self._timed_fetch(primary, session, symbols))
+
+        done, _ = await asyncio.wait({primary_task}, timeout=delay)
+        if done:
+            return primary_task.result(), 0
+
+        self.hedged_requests += 1
+        logger.info(f"Provider {primary.name} slower than {delay:.2f}s, hedging to {secondary.name}")
+        hedge_task = asyncio.create_task(self._timed_fetch(secondary, session, symbols))
+        pending = {primary_task, hedge_task}
+        quotes = {}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                quotes.update(task.result())
+            if all(s.name in quotes for s in symbols):
+                break
+
+        for task in pending:
+            task.cancel()
+        # The secondary has been consulted either way, so failover continues after it
+        return quotes, 1
+
+
+class BreakerProvider(QuoteProvider):
+    """Wraps a provider in a circuit breaker.
+
+    A fetch that returns none of the requested quotes (errors, rate-limit
+    notes, timeouts) counts as a failure. While the circuit is open fetches
+    return nothing immediately, so a failing upstream costs no HTTP calls or
+    API budget until the breaker lets a trial request through.
+    """
+
+    def __init__(self, provider, breaker):
+        self.provider = provider
+        self.breaker = breaker
+        self.name = provider.name
+
+    @property
+    def call_count(self):
+        return self.provider.call_count
+
+    def calls_per_cycle(self, symbols):
+        return self.provider.calls_per_cycle(symbols)
+
+    async def fetch_quotes(self, session, symbols):
+        symbols = list(symbols)
+        if not symbols or not self.breaker.allow():
+            return {}
+        try:
+            quotes = await self.provider.fetch_quotes(session, symbols)
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        if quotes:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        return quotes
+
+
+def provider_from_env():
+    """Build the quote provider chain from QUOTE_PROVIDERS and related settings"""
+    providers = []
+    for name in os.getenv('QUOTE_PROVIDERS', 'alphavantage').split(','):
+        name = name.strip().lower()
+        if name == 'alphavantage':
+            providers.append(AlphaVantageProvider(
+                os.getenv('ALPHA_VANTAGE_API_KEY', 'demo'),
+                base_url=os.getenv('ALPHA_VANTAGE_BASE_URL', ALPHA_VANTAGE_URL),
+                bulk=os.getenv('ALPHA_VANTAGE_BULK', 'false').lower() == 'true'
+            ))
+        elif name == 'file':
+            providers.append(FileProvider(os.getenv('QUOTE_FILE_PATH', 'quotes.json')))
+        elif name:
+            raise ValueError(f"Unknown quote provider '{name}'")
+
+    if os.getenv('CIRCUIT_BREAKER', 'true').lower() == 'true':
+        providers = [
+            BreakerProvider(provider, CircuitBreaker(
+                provider.name,
+                failure_threshold=int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '3')),
+                base_delay=float(os.getenv('CIRCUIT_BASE_DELAY_SECONDS', '30')),
+                max_delay=float(os.getenv('CIRCUIT_MAX_DELAY_SECONDS', '1800'))
+            ))
+            for provider in providers
+        ]
+
+    if len(providers) == 1:
+        return providers[0]
+    return ProviderRouter(
+        providers,
+        hedge=os.getenv('QUOTE_HEDGE', 'false').lower() == 'true',
+        hedge_after=float(os.getenv('QUOTE_HEDGE_AFTER_SECONDS', '2'))
+    )
@@ -0,0 +1,234 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import deque
+from datetime import datetime, time as dtime, timedelta
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+EASTERN = ZoneInfo('America/New_York')
+
+# Regular US equity session, Eastern time
+MARKET_OPEN = dtime(9, 30)
+MARKET_CLOSE = dtime(16, 0)
+
+
+def regular_session(now):
+    """Return today's (open, close) as Eastern datetimes, or None on weekends"""
+    now = now.astimezone(EASTERN)
+    if now.weekday() >= 5:
+        return None
+    return (
+        datetime.combine(now.date(), MARKET_OPEN, tzinfo=EASTERN),
+        datetime.combine(now.date(), MARKET_CLOSE, tzinfo=EASTERN)
+    )
+
+
+class QuotaBudget:
+    """Per-day and rolling per-minute API call budget.
+
+    The daily counter follows the Eastern calendar day and is persisted to
+    `path` so restarts don't forget what was spent. record() only counts in
+    memory; callers on the event loop then await persist(), which writes
+    off the loop, so reads such as the /metrics gauge never touch the disk.
+    """
+
+    def __init__(self, per_minute, per_day, path=None):
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.path = path
+        self.day = self._today()
+        self.used_today = 0
+
+        # monotonic timestamps of calls made in the last 60 seconds
+        self._recent = deque()
+        self._dirty = False
+        self._save_lock = asyncio.Lock()
+        self.load()
+
+    @staticmethod
+    def _today():
+        return datetime.now(EASTERN).date().isoformat()
+
+    def _roll_day(self):
+        today = self._today()
+        if today != self.day:
+            logger.info(f"New quota day {today}, {self.used_today} calls were used on {self.day}")
+            self.day = today
+            self.used_today = 0
+
+    def _prune(self):
+        cutoff = time.monotonic() - 60
+        while self._recent and self._recent[0] < cutoff:
+            self._recent.popleft()
+
+    @property
+    def remaining_today(self):
+        self._roll_day()
+        return max(0, self.per_day - self.used_today)
+
+    @property
+    def remaining_this_minute(self):
+        self._prune()
+        return max(0, self.per_minute - len(self._recent))
+
+    def can_spend(self, calls):
+        return calls <= self.remaining_today and calls <= self.remaining_this_minute
+
+    def record(self, calls):
+        """Record calls that were actually made"""
+        if calls <= 0:
+            return
+        self._roll_day()
+        now = time.monotonic()
+        self._recent.extend([now] * calls)
+        self.used_today += calls
+        self._dirty = True
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('day') == self.day:
+                self.used_today = int(data.get('used', 0))
+                logger.info(f"Loaded quota state: {self.used_today}/{self.per_day} calls used today")
+        except (OSError, ValueError, TypeError) as e:
+            logger.error(f"Could not load quota state from {self.path}: {e}")
+
+    async def persist(self):
+        """Save off the event loop if calls were recorded since the last save"""
+        if not self._dirty:
+            return
+        self._dirty = False
+        data = {'day': self.day, 'used': self.used_today}
+        # One write at a time, in order, so an older count never lands last
+        async with self._save_lock:
+            await asyncio.to_thread(self._write, data)
+
+    def save(self):
+        """Blocking save of the current count"""
+        self._dirty = False
+        self._write({'day': self.day, 'used': self.used_today})
+
+    def _write(self, data):
+        if not self.path:
+            return
+        tmp_path = None
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.quota-')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Could not save quota state to {self.path}: {e}")
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+class QuotaScheduler:
+    """Spreads the remaining daily budget over the rest of the day.
+
+    Time is weighted: the first and last `edge_minutes` of the session count
+    `edge_weight` times, the rest of the session once, and time outside the
+    session `off_hours_weight`. The call rate at any moment is proportional
+    to its weight, so fetches speed up near the open and close and slow
+    down as the budget runs low. Once the budget is spent the next fetch
+    waits for the reset at midnight Eastern.
+    """
+
+    STEP = timedelta(minutes=5)
+
+    def __init__(self, budget, min_interval=60, session=regular_session,
+                 edge_minutes=30, edge_weight=3.0, off_hours_weight=0.2):
+        self.budget = budget
+        self.min_interval = min_interval
+        self.session = session
+        self.edge = timedelta(minutes=edge_minutes)
+        self.edge_weight = edge_weight
+        self.off_hours_weight = off_hours_weight
+
+    def weight(self, when):
+        bounds = self.session(when)
+        if not bounds:
+            return self.off_hours_weight
+        open_at, close_at = bounds
+        if not open_at <= when < close_at:
+            return self.off_hours_weight
+        if when < open_at + self.edge or when >= close_at - self.edge:
+            return self.edge_weight
+        return 1.0
+
+    def _weighted_seconds_left(self, now):
+        """Integrate the weight from now until the budget resets at midnight Eastern"""
+        midnight = datetime.combine(now.date() + timedelta(days=1), dtime(0), tzinfo=EASTERN)
+        total, t = 0.0, now
+        while t < midnight:
+            step = min(self.STEP, midnight - t)
+            total += self.weight(t) * step.total_seconds()
+            t += step
+        return total, midnight
+
+    def _rate(self, now):
+        """Calls per weighted second that would exactly spend the remaining budget"""
+        weighted, _ = self._weighted_seconds_left(now)
+        if weighted <= 0 or self.budget.remaining_today <= 0:
+            return 0.0
+        return self.budget.remaining_today / weighted
+
+    def next_interval(self, calls_per_cycle, now=None):
+        """Seconds to wait before the next fetch costing calls_per_cycle calls"""
+        now = (now or datetime.now(EASTERN)).astimezone(EASTERN)
+        rate = self._rate(now) * self.weight(now)
+        if rate <= 0:
+            _, midnight = self._weighted_seconds_left(now)
+            return (midnight - now).total_seconds() + 1
+        return max(self.min_interval, calls_per_cycle / rate)
+
+    def forecast(self, calls_per_cycle, now=None):
+        """Calls expected to be left at the end of the day if the schedule is followed"""
+        now = (now or datetime.now(EASTERN)).astimezone(EASTERN)
+        rate = self._rate(now)
+        _, midnight = self._weighted_seconds_left(now)
+        planned, t = 0.0, now
+        while t < midnight:
+            step = min(self.STEP, midnight - t)
+            weight = self.weight(t)
+            # Zero-weight time (market closed without extended hours) plans no fetches
+            if rate > 0 and weight > 0:
+                interval = max(self.min_interval, calls_per_cycle / (rate * weight))
+                planned += calls_per_cycle * step.total_seconds() / interval
+            t += step
+        return int(self.budget.remaining_today - planned)
+
+
+def quota_scheduler_from_env(calendar=None):
+    """Build a QuotaScheduler from the environment, or None if QUOTA_SCHEDULING is off.
+
+    With a market calendar the budget follows its sessions (holidays and
+    early closes included), and closed hours only get weight when extended
+    hours are fetched.
+    """
+    if os.getenv('QUOTA_SCHEDULING', 'true').lower() != 'true':
+        return None
+    budget = QuotaBudget(
+        per_minute=int(os.getenv('ALPHA_VANTAGE_MINUTE_LIMIT', '5')),
+        per_day=int(os.getenv('ALPHA_VANTAGE_DAILY_LIMIT', '25')),
+        path=os.getenv('QUOTA_STATE_PATH', 'quota_state.json')
+    )
+    min_interval = float(os.getenv('QUOTA_MIN_INTERVAL_SECONDS', '60'))
+    if calendar is None:
+        return QuotaScheduler(budget, min_interval=min_interval)
+    return QuotaScheduler(
+        budget,
+        min_interval=min_interval,
+        session=calendar.regular_session,
+        off_hours_weight=0.2 if calendar.extended_hours else 0.0
+    )
@@ -0,0 +1,218 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TickerSymbol:
+    """A symbol the bot tracks; kind is 'equity' or 'crypto'"""
+    name: str
+    kind: str = 'equity'
+
+
+class SymbolRegistry:
+    """Ordered set of tracked symbols; the first one is shown in the nickname"""
+
+    def __init__(self, symbols):
+        self._symbols = {}
+        for symbol in symbols:
+            self._symbols[symbol.name] = symbol
+        if not self._symbols:
+            raise ValueError("At least one ticker symbol is required")
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Parse a spec such as 'MSTR,COIN,BTC:crypto'"""
+        symbols = []
+        for entry in spec.split(','):
+            entry = entry.strip()
+            if not entry:
+                continue
+            name, _, kind = entry.partition(':')
+            kind = kind.strip().lower() or 'equity'
+            if kind not in ('equity', 'crypto'):
+                raise ValueError(f"Unknown symbol kind '{kind}' for {name}")
+            symbols.append(TickerSymbol(name.strip().upper(), kind))
+        return cls(symbols)
+
+    @property
+    def primary(self):
+        return next(iter(self._symbols.values()))
+
+    @property
+    def names(self):
+        return list(self._symbols)
+
+    def get(self, name):
+        return self._symbols.get(name.upper())
+
+    def __iter__(self):
+        return iter(self._symbols.values())
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def __contains__(self, name):
+        return name.upper() in self._symbols
+
+
+@dataclass
+class QuoteState:
+    """Latest known quote for one symbol"""
+    symbol: str
+    quote: dict = None
+    last_update: datetime = None
+    failures: int = 0
+
+    def record(self, quote):
+        self.quote = quote
+        self.last_update = quote['timestamp']
+        self.failures = 0
+
+    @property
+    def age(self):
+        """Seconds since the cached quote was fetched, or None if there is none"""
+        if self.quote is None:
+            return None
+        return (datetime.now() - self.quote['timestamp']).total_seconds()
+
+
+class QuoteCache:
+    """In-memory quote cache keyed by symbol.
+
+    A quote is fresh for `ttl` seconds. For a further `stale_while_revalidate`
+    seconds it is still served immediately while a background refresh runs.
+    Past that, a read waits for a refresh; if the refresh fails, a quote up
+    to `stale_if_error` seconds past its TTL is served instead of nothing,
+    and usable() stops returning it after that.
+    At most one refresh per symbol is in flight and concurrent readers share
+    it. `loader` is an async callable taking symbol names and returning
+    {name: price_data} for the ones it could fetch.
+    """
+
+    def __init__(self, loader, symbols, ttl, stale_while_revalidate=60, stale_if_error=3600):
+        self.loader = loader
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_if_error = stale_if_error
+        self.states = {name: QuoteState(name) for name in symbols}
+        
+        # name -> refresh task currently loading that symbol
+        self._inflight = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def peek(self, name):
+        """Return the cached quote regardless of age, without triggering a refresh"""
+        state = self.states.get(name)
+        return state.quote if state else None
+
+    def age(self, name):
+        state = self.states.get(name)
+        return state.age if state else None
+
+    @property
+    def refreshing(self):
+        """Whether any refresh is in flight"""
+        return bool(self._inflight)
+
+    def usable(self, name):
+        """The cached quote while it is within the stale windows, else None"""
+        age = self.age(name)
+        if age is None or age > self.ttl + max(self.stale_while_revalidate, self.stale_if_error):
+            return None
+        return self.states[name].quote
+
+    def status(self, name):
+        """One of 'fresh', 'stale', 'expired' or 'missing'"""
+        age = self.age(name)
+        if age is None:
+            return 'missing'
+        if age <= self.ttl:
+            return 'fresh'
+        if age <= self.ttl + self.stale_while_revalidate:
+            return 'stale'
+        return 'expired'
+
+    async def get(self, name):
+        return (await self.get_many([name])).get(name)
+
+    async def get_many(self, names):
+        """Serve quotes from memory, refreshing stale or missing ones as needed"""
+        names = [name for name in names if name in self.states]
+        blocking, background = [], []
+        for name in names:
+            status = self.status(name)
+            if status == 'fresh':
+                self.hits += 1
+            elif status == 'stale':
+                self.stale_hits += 1
+                background.append(name)
+            else:
+                self.misses += 1
+                blocking.append(name)
+
+        if background:
+            self._start_refresh(background)
+        if blocking:
+            await self.refresh(blocking)
+
+        quotes = {}
+        for name in names:
+            quote = self.usable(name)
+            if quote is not None:
+                quotes[name] = quote
+        return quotes
+
+    async def refresh(self, names):
+        """Refresh names now, joining refreshes already in flight; returns the quotes fetched"""
+        self._start_refresh(names)
+        tasks = {self._inflight[name] for name in names if name in self._inflight}
+        quotes = {}
+        for result in await asyncio.gather(*tasks):
+            quotes.update(result)
+        return {name: quotes[name] for name in names if name in quotes}
+
+    def _start_refresh(self, names):
+        pending = [name for name in names if name not in self._inflight]
+        if pending:
+            task = asyncio.create_task(self._load(pending))
+            for name in pending:
+                self._inflight[name] = task
+
+    async def _load(self, names):
+        try:
+            quotes = await self.loader(names)
+        except Exception as e:
+            logger.error(f"Error refreshing quotes for {', '.join(names)}: {e}")
+            quotes = {}
+
+        for name in names:
+            state = self.states[name]
+            if name in quotes:
+                state.record(quotes[name])
+            else:
+                state.failures += 1
+            self._inflight.pop(name, None)
+        return quotes
+
+    def cancel(self):
+        """Cancel any refreshes still in flight (used on shutdown)"""
+        for task in set(self._inflight.values()):
+            task.cancel()
+        self._inflight.clear()
+
+
+def make_quote(symbol, price, change, volume=0.0, timestamp=None):
+    """Build the price_data dict passed around the bot"""
+    return {
+        'symbol': symbol,
+        'price': price,
+        'change': change,
+        'volume': volume,
+        'timestamp': timestamp or datetime.now()
+    }
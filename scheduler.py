@@ -0,0 +1,126 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineScheduler:
+    """Runs named async jobs at deadlines on the monotonic clock.
+
+    Due times live in a heap and the runner sleeps exactly until the
+    earliest one, waking early only when an earlier job is scheduled. A job
+    is an async callable returning the delay in seconds until its next run,
+    or None to stop. Scheduling a name again replaces its pending run, and
+    a job never runs concurrently with itself: a run that comes due while
+    the previous one is still going starts as soon as that one finishes.
+    """
+
+    def __init__(self, error_delay=60.0):
+        self.error_delay = error_delay
+        self._heap = []
+        self._jobs = {}
+        self._running = set()
+        self._deferred = set()
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._runner = None
+        self._tasks = set()
+
+    def schedule(self, name, job, delay=0.0):
+        """Run job under name after delay seconds, replacing any pending run"""
+        deadline = time.monotonic() + max(0.0, delay)
+        token = next(self._counter)
+        self._jobs[name] = (job, token, deadline)
+        heapq.heappush(self._heap, (deadline, token, name))
+        self._wakeup.set()
+
+    def cancel(self, name):
+        """Drop a job's pending run; a run already in progress finishes"""
+        self._jobs.pop(name, None)
+        self._deferred.discard(name)
+
+    def is_scheduled(self, name):
+        return name in self._jobs
+
+    def due_in(self, name):
+        """Seconds until a job's next run, or None if it is not scheduled"""
+        entry = self._jobs.get(name)
+        if entry is None:
+            return None
+        return max(0.0, entry[2] - time.monotonic())
+
+    def start(self):
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the runner and cancel jobs in progress"""
+        tasks = list(self._tasks)
+        if self._runner is not None:
+            tasks.append(self._runner)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._runner = None
+
+    def _pop_due(self):
+        """Pop the next live heap entry that is due, or return its delay"""
+        while self._heap:
+            deadline, token, name = self._heap[0]
+            entry = self._jobs.get(name)
+            if entry is None or entry[1] != token:
+                # Superseded or cancelled
+                heapq.heappop(self._heap)
+                continue
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                return None, delay
+            heapq.heappop(self._heap)
+            return name, 0.0
+        return None, None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            name, delay = self._pop_due()
+            if name is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job, token, _ = self._jobs[name]
+            if name in self._running:
+                self._deferred.add(name)
+                continue
+            task = asyncio.create_task(self._run_job(name, job, token))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_job(self, name, job, token):
+        self._running.add(name)
+        delay = None
+        try:
+            delay = await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Scheduled job {name} failed: {e}")
+            delay = self.error_delay
+        finally:
+            self._running.discard(name)
+
+        if name in self._deferred and name in self._jobs:
+            # A newer run came due while this one was going
+            self._deferred.discard(name)
+            self.schedule(name, self._jobs[name][0])
+        elif self._jobs.get(name, (None, None))[1] == token:
+            # Nobody rescheduled the job meanwhile, so follow its own delay
+            if delay is None:
+                self._jobs.pop(name, None)
+            else:
+                self.schedule(name, job, delay)
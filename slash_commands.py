@@ -0,0 +1,109 @@
+import hashlib
+import json
+import time
+from typing import Optional
+
+import discord
+from discord import app_commands
+
+import metrics
+
+
+def format_age(seconds):
+    """Render a duration such as '42s', '5m 3s' or '2h 10m'"""
+    if seconds is None:
+        return 'n/a'
+    seconds = int(seconds)
+    if seconds < 60:
+        return f'{seconds}s'
+    if seconds < 3600:
+        return f'{seconds // 60}m {seconds % 60}s'
+    return f'{seconds // 3600}h {seconds % 3600 // 60}m'
+
+
+def command_signature(tree):
+    """Stable hash of the registered commands, used to skip redundant syncs"""
+    entries = []
+    for command in tree.get_commands():
+        params = [
+            (p.name, p.description, str(p.type), p.required)
+            for p in getattr(command, 'parameters', [])
+        ]
+        entries.append((command.qualified_name, command.description, params))
+    payload = json.dumps(sorted(entries), separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def price_message(bot, name):
+    """Answer for /price, built only from cached state"""
+    symbol = bot.symbols.get(name)
+    if symbol is None:
+        return f"Not tracking {name.upper()}. Tracked symbols: {', '.join(bot.symbols.names)}"
+    quote = bot.quote_cache.peek(symbol.name)
+    if quote is None:
+        return f"No quote for {symbol.name} yet, the next fetch is in {format_age(bot.next_fetch_in)}"
+
+    change_symbol = "📈" if quote['change'] >= 0 else "📉"
+    lines = [f"**{symbol.name}** ${quote['price']:.2f} ({quote['change']:+.2f}) {change_symbol}"]
+    if quote.get('volume'):
+        lines.append(f"Volume: {quote['volume']:,.0f}")
+    history = bot.history.get(symbol.name)
+    if history is not None:
+        hour_change = history.percent_change(3600)
+        if hour_change is not None:
+            lines.append(f"1h: {hour_change:+.2f}% over {len(history.since('price', 3600))} quotes")
+    lines.append(f"Updated {format_age(bot.quote_cache.age(symbol.name))} ago ({bot.quote_cache.status(symbol.name)})")
+    return '\n'.join(lines)
+
+
+def stats_message(bot):
+    """Answer for /stats, built only from cached state"""
+    lines = [
+        f"Uptime: {format_age(time.monotonic() - bot.started_at)}",
+        f"Guilds: {len(bot.guilds)}",
+        f"Quote age: {format_age(bot.quote_age)}, next fetch in {format_age(bot.next_fetch_in)}",
+        f"API calls: {bot.api_call_count}",
+    ]
+    if bot.quota_scheduler is not None:
+        budget = bot.quota_scheduler.budget
+        lines.append(f"API budget: {budget.used_today}/{budget.per_day} used today")
+    cache = bot.quote_cache
+    lines.append(f"Quote cache: {cache.hits} hits, {cache.stale_hits} stale, {cache.misses} misses")
+    stats = bot.last_fanout_stats
+    if stats is not None:
+        lines.append(
+            f"Last fan-out: {stats.updated} updated, {stats.skipped} unchanged, {stats.forbidden} forbidden, "
+            f"{stats.failed} failed in {stats.duration:.2f}s"
+        )
+    return '\n'.join(lines)
+
+
+async def respond(interaction, content, start):
+    """Send an ephemeral reply and record the latency since the handler started"""
+    try:
+        await interaction.response.send_message(content, ephemeral=True)
+    finally:
+        metrics.INTERACTION_LATENCY.observe(time.perf_counter() - start)
+
+
+def register_commands(bot):
+    """Add /price and /stats to bot.tree; both answer from memory only"""
+
+    async def symbol_autocomplete(interaction, current):
+        current = current.upper()
+        return [
+            app_commands.Choice(name=name, value=name)
+            for name in bot.symbols.names if name.startswith(current)
+        ][:25]
+
+    @bot.tree.command(name='price', description='Latest cached quote for a tracked symbol')
+    @app_commands.describe(symbol='Ticker symbol (defaults to the one in the nickname)')
+    @app_commands.autocomplete(symbol=symbol_autocomplete)
+    async def price(interaction: discord.Interaction, symbol: Optional[str] = None):
+        start = time.perf_counter()
+        await respond(interaction, price_message(bot, symbol or bot.primary_symbol), start)
+
+    @bot.tree.command(name='stats', description='Bot status: quote age, API budget and last nickname update')
+    async def stats(interaction: discord.Interaction):
+        start = time.perf_counter()
+        await respond(interaction, stats_message(bot), start)
@@ -0,0 +1,91 @@
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from quotes import make_quote
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+
+
+def encode_quote(quote):
+    return {**quote, 'timestamp': quote['timestamp'].isoformat()}
+
+
+def decode_quote(data):
+    return make_quote(
+        data['symbol'],
+        price=float(data['price']),
+        change=float(data['change']),
+        volume=float(data.get('volume', 0.0)),
+        timestamp=datetime.fromisoformat(data['timestamp'])
+    )
+
+
+class StateStore:
+    """Small JSON snapshot of the bot's state for warm restarts.
+
+    Holds the last quote per symbol, the nickname applied in each guild and
+    the hash of the last synced slash commands (the API budget has its own
+    file, see QuotaBudget). Writes go to a temp file that is flushed to disk
+    and then replaces the snapshot atomically, so a crash mid-write leaves
+    the previous one intact.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """Return the saved snapshot, or {} if there is none or it is unreadable"""
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        start = time.perf_counter()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != STATE_VERSION:
+                logger.warning(f"Ignoring state snapshot {self.path} with version {data.get('version')}")
+                return {}
+            logger.info(f"Loaded state snapshot from {self.path} in {(time.perf_counter() - start) * 1000:.1f}ms")
+            return data
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            logger.error(f"Could not load state snapshot from {self.path}: {e}")
+            return {}
+
+    def save(self, quotes, applied, command_signature=None):
+        """Write quotes {name: price_data}, applied {guild_id: nickname} and the synced commands.
+
+        Blocking; the bot runs it in a worker thread.
+        """
+        if not self.path:
+            return
+        data = {
+            'version': STATE_VERSION,
+            'saved_at': datetime.now().isoformat(),
+            'quotes': {name: encode_quote(quote) for name, quote in quotes.items()},
+            'applied': {str(guild_id): nickname for guild_id, nickname in applied.items()},
+        }
+        if command_signature is not None:
+            data['command_signature'] = command_signature
+        tmp_path = None
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.state-')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Could not save state snapshot to {self.path}: {e}")
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+def state_store_from_env():
+    """StateStore at STATE_PATH, or None when STATE_PATH is empty"""
+    path = os.getenv('STATE_PATH', 'bot_state.json')
+    return StateStore(path) if path else None
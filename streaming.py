@@ -0,0 +1,201 @@
+import asyncio
+import json
+import logging
+import math
+import time
+from datetime import datetime
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class LatestSlot:
+    """Newest tick per symbol; writers overwrite instead of queueing.
+
+    Memory is bounded by the number of symbols no matter how fast ticks
+    arrive, and readers wait on a version counter rather than a queue.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.version = 0
+        self._changed = asyncio.Event()
+
+    def put(self, symbol, tick):
+        self.values[symbol] = tick
+        self.version += 1
+        self._changed.set()
+
+    def take(self):
+        """Return and clear the ticks written since the last take"""
+        values, self.values = self.values, {}
+        return values
+
+    async def wait_newer(self, version):
+        """Wait until the slot has moved past version; returns the new version"""
+        while self.version == version:
+            self._changed.clear()
+            await self._changed.wait()
+        return self.version
+
+
+class TickStream:
+    """Consumes a websocket (ws://, wss://) or SSE (http://, https://) tick feed.
+
+    Each message is a JSON object, or a list of them, with at least
+    'symbol' and 'price' and optionally 'change', 'volume' and 'timestamp'
+    (ISO format or epoch seconds). Ticks for untracked symbols are dropped.
+    The connection is re-established with exponential backoff.
+    """
+
+    def __init__(self, url, symbols, slot, connect_timeout=10.0, reconnect_delay=1.0, max_reconnect_delay=60.0):
+        self.url = url
+        self.symbols = set(symbols)
+        self.slot = slot
+        self.connect_timeout = connect_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.connected = False
+        self.last_tick_at = None
+        self.ticks = 0
+        self.reconnects = 0
+
+    @property
+    def tick_age(self):
+        """Seconds since the last tick was received, or None"""
+        return None if self.last_tick_at is None else time.monotonic() - self.last_tick_at
+
+    @property
+    def live(self):
+        return self.connected and self.last_tick_at is not None
+
+    async def run(self):
+        """Consume the feed until cancelled"""
+        delay = self.reconnect_delay
+        # No total timeout: the connection is meant to stay open
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            while True:
+                ticks_before = self.ticks
+                try:
+                    if self.url.startswith(('ws://', 'wss://')):
+                        await self._consume_ws(session)
+                    else:
+                        await self._consume_sse(session)
+                    logger.warning("Tick stream closed by server")
+                except asyncio.CancelledError:
+                    raise
+                except (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError) as e:
+                    logger.error(f"Tick stream error: {e}")
+                except Exception as e:
+                    # e.g. a UnicodeDecodeError from the feed; never let it end the task
+                    logger.error(f"Unexpected tick stream error: {e!r}")
+                finally:
+                    self.connected = False
+
+                # A connection that delivered ticks resets the backoff
+                if self.ticks > ticks_before:
+                    delay = self.reconnect_delay
+                logger.info(f"Reconnecting to tick stream in {delay:.0f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+                self.reconnects += 1
+
+    async def _consume_ws(self, session):
+        async with session.ws_connect(self.url, heartbeat=30) as ws:
+            self._on_connect()
+            async for message in ws:
+                if message.type == aiohttp.WSMsgType.TEXT:
+                    self._handle(message.data)
+                elif message.type == aiohttp.WSMsgType.ERROR:
+                    raise aiohttp.ClientError(f"websocket error: {ws.exception()}")
+
+    async def _consume_sse(self, session):
+        async with session.get(self.url, headers={'Accept': 'text/event-stream'}) as response:
+            response.raise_for_status()
+            self._on_connect()
+            data = []
+            async for raw in response.content:
+                line = raw.decode('utf-8').rstrip('\r\n')
+                if line.startswith('data:'):
+                    data.append(line[5:].lstrip())
+                elif not line and data:
+                    # A blank line ends the event
+                    self._handle('\n'.join(data))
+                    data = []
+
+    def _on_connect(self):
+        self.connected = True
+        logger.info(f"Connected to tick stream {self.url}")
+
+    def _handle(self, payload):
+        try:
+            message = json.loads(payload)
+        except ValueError as e:
+            logger.warning(f"Ignoring malformed tick: {e}")
+            return
+        for tick in message if isinstance(message, list) else [message]:
+            try:
+                symbol = str(tick['symbol']).upper()
+                if symbol not in self.symbols:
+                    continue
+                price = float(tick['price'])
+                if not math.isfinite(price):
+                    continue
+                self.slot.put(symbol, {
+                    'price': price,
+                    'change': float(tick['change']) if tick.get('change') is not None else None,
+                    'volume': float(tick.get('volume') or 0.0),
+                    'timestamp': _parse_timestamp(tick.get('timestamp')),
+                })
+                self.ticks += 1
+                self.last_tick_at = time.monotonic()
+            except (KeyError, ValueError, TypeError, AttributeError) as e:
+                logger.warning(f"Ignoring malformed tick {tick!r}: {e}")
+
+
+def _parse_timestamp(value):
+    """Tick timestamp as a naive local datetime, like the rest of the quote data"""
+    if value is None:
+        return datetime.now()
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value)
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+class Debouncer:
+    """Runs an async action when the slot changes, at most once per min_interval.
+
+    Changes that arrive while waiting or while the action runs are folded
+    into the next run, so the action always sees the newest values and its
+    rate is bounded by min_interval however fast the slot is written.
+    """
+
+    def __init__(self, slot, action, min_interval):
+        self.slot = slot
+        self.action = action
+        self.min_interval = min_interval
+        self.runs = 0
+
+    async def run(self):
+        version = self.slot.version
+        last_run = -math.inf
+        while True:
+            version = await self.slot.wait_newer(version)
+            wait = last_run + self.min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            # Everything written during the wait is handled by this run
+            version = self.slot.version
+            last_run = time.monotonic()
+            try:
+                await self.action()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Debounced update failed: {e}")
+            self.runs += 1
@@ -0,0 +1,72 @@
+import random
+import time
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+import metrics
+from circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def breaker_transitions():
+    return metrics.CIRCUIT_TRANSITIONS.value
+
+
+def make_breaker(threshold=2):
+    return CircuitBreaker('test', failure_threshold=threshold, base_delay=30.0, rng=random.Random(1))
+
+
+def test_opens_after_threshold():
+    breaker = make_breaker()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_late_verdicts_while_open_are_ignored():
+    breaker = make_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    retry_at, openings = breaker.retry_at, breaker.openings
+
+    # Calls that were already in flight when the circuit opened
+    breaker.record_failure()
+    breaker.record_success()
+
+    assert breaker.state == OPEN
+    assert (breaker.retry_at, breaker.openings) == (retry_at, openings)
+
+
+def test_half_open_trial(monkeypatch):
+    breaker = make_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    monkeypatch.setattr(time, 'monotonic', lambda: breaker.retry_at)
+
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.openings == 2
+
+    monkeypatch.setattr(time, 'monotonic', lambda: breaker.retry_at)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.openings == 0
+
+
+def test_release_lets_the_next_call_retry():
+    breaker = make_breaker(threshold=1)
+    breaker.record_failure()
+    breaker.retry_at = time.monotonic()
+    assert breaker.allow()
+    transitions = breaker_transitions()
+    breaker.release()
+    assert breaker.state == OPEN
+    assert breaker_transitions() == transitions + 1
+    assert breaker.allow()
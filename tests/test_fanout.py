@@ -0,0 +1,135 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+discord = pytest.importorskip('discord')
+pytest.importorskip('aiohttp')
+
+from fanout import NicknameFanout
+
+
+class FakeMember:
+    """The bot's member in one guild; edit() records every call"""
+
+    def __init__(self, guild_id, delay=0.01, error=None):
+        self.guild = SimpleNamespace(id=guild_id, name=f'guild-{guild_id}')
+        self.nick = None
+        self.delay = delay
+        self.error = error
+        self.edits = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def edit(self, nick=None):
+        self.edits.append(nick)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error is not None:
+                raise self.error
+            self.nick = nick
+        finally:
+            self.in_flight -= 1
+
+
+def forbidden():
+    return discord.Forbidden(SimpleNamespace(status=403, reason='Forbidden'), 'Missing Permissions')
+
+
+def make_fanout(concurrency=10):
+    return NicknameFanout(concurrency=concurrency, rate_per_second=1e9)
+
+
+def test_overlapping_runs_send_only_the_latest_nickname():
+    async def scenario():
+        fanout = make_fanout()
+        member = FakeMember(1)
+        first = asyncio.create_task(fanout.run([member], 'a'))
+        await asyncio.sleep(0)
+        results = await asyncio.gather(first, fanout.run([member], 'b'), fanout.run([member], 'c'))
+        assert member.edits == ['a', 'c']
+        assert fanout.applied[1] == 'c'
+        assert sum(r.coalesced for r in results) == 2
+    asyncio.run(scenario())
+
+
+def test_unchanged_nickname_is_skipped():
+    async def scenario():
+        fanout = make_fanout()
+        member = FakeMember(1)
+        await fanout.run([member], 'a')
+        stats = await fanout.run([member], 'a')
+        assert member.edits == ['a']
+        assert stats.skipped == 1
+    asyncio.run(scenario())
+
+
+def test_forbidden_with_overlapping_run_is_one_strike():
+    async def scenario():
+        fanout = make_fanout()
+        member = FakeMember(1, error=forbidden())
+        first = asyncio.create_task(fanout.run([member], 'a'))
+        await asyncio.sleep(0)
+        results = await asyncio.gather(first, fanout.run([member], 'b'))
+        assert member.edits == ['a']
+        assert sum(r.forbidden for r in results) == 1
+        assert fanout.quarantine[1][1] == 1
+        assert 1 not in fanout.pending
+    asyncio.run(scenario())
+
+
+def test_quarantined_guild_is_skipped_until_released():
+    async def scenario():
+        fanout = make_fanout()
+        member = FakeMember(1, error=forbidden())
+        await fanout.run([member], 'a')
+        stats = await fanout.run([member], 'b')
+        assert stats.quarantined == 1
+        assert member.edits == ['a']
+
+        member.error = None
+        assert fanout.release(1)
+        await fanout.run([member], 'c')
+        assert member.nick == 'c'
+    asyncio.run(scenario())
+
+
+def test_rate_limited_guild_is_deferred_and_cancelled_on_close():
+    async def scenario():
+        fanout = make_fanout()
+        member = FakeMember(1, error=discord.RateLimited(60.0))
+        stats = await fanout.run([member], 'a')
+        assert stats.rate_limited == 1
+        assert fanout.pending[1] == 'a'
+        assert len(fanout._deferred) == 1
+
+        fanout.close()
+        await asyncio.sleep(0)
+        assert not fanout._deferred
+        assert 1 not in fanout._active
+    asyncio.run(scenario())
+
+
+def test_concurrency_is_shared_across_runs():
+    async def scenario():
+        fanout = make_fanout(concurrency=3)
+        shards = [[FakeMember(shard * 100 + i) for i in range(10)] for shard in range(4)]
+        in_flight = peak = 0
+
+        async def counted(member, nickname):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            try:
+                await asyncio.sleep(0.005)
+                member.nick = nickname
+            finally:
+                in_flight -= 1
+
+        fanout._timed_edit = counted
+        results = await asyncio.gather(*(fanout.run(members, 'a') for members in shards))
+        assert sum(r.updated for r in results) == 40
+        assert peak == 3
+    asyncio.run(scenario())
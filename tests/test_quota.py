@@ -0,0 +1,113 @@
+import asyncio
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from market_calendar import MarketCalendar
+from quota import EASTERN, QuotaBudget, QuotaScheduler
+
+# A regular Wednesday session and Thanksgiving, both in Eastern time
+TRADING_DAY = (2026, 10, 14)
+HOLIDAY = (2026, 11, 26)
+
+
+def eastern(year, month, day, hour, minute=0):
+    return datetime(year, month, day, hour, minute, tzinfo=EASTERN)
+
+
+def calendar_scheduler(extended_hours=False, per_day=25, used=0):
+    calendar = MarketCalendar(extended_hours=extended_hours)
+    budget = QuotaBudget(per_minute=5, per_day=per_day)
+    budget.used_today = used
+    return QuotaScheduler(
+        budget,
+        session=calendar.regular_session,
+        off_hours_weight=0.2 if extended_hours else 0.0
+    )
+
+
+@pytest.mark.parametrize('hour', [3, 9, 12, 15, 17, 23])
+def test_forecast_with_zero_off_hours_weight(hour):
+    scheduler = calendar_scheduler()
+    left = scheduler.forecast(1, eastern(*TRADING_DAY, hour))
+    assert 0 <= left <= scheduler.budget.remaining_today
+
+
+def test_forecast_spends_budget_during_session():
+    scheduler = calendar_scheduler()
+    assert scheduler.forecast(1, eastern(*TRADING_DAY, 9, 30)) <= 1
+
+
+def test_forecast_keeps_budget_after_close():
+    scheduler = calendar_scheduler()
+    assert scheduler.forecast(1, eastern(*TRADING_DAY, 17)) == 25
+
+
+def test_forecast_on_holiday():
+    scheduler = calendar_scheduler()
+    assert scheduler.forecast(1, eastern(*HOLIDAY, 12)) == 25
+
+
+def test_forecast_with_exhausted_budget():
+    scheduler = calendar_scheduler(used=25)
+    assert scheduler.forecast(1, eastern(*TRADING_DAY, 12)) == 0
+
+
+def test_next_interval_during_session():
+    scheduler = calendar_scheduler()
+    interval = scheduler.next_interval(1, eastern(*TRADING_DAY, 12))
+    assert scheduler.min_interval <= interval < 6.5 * 3600
+
+
+def test_next_interval_faster_at_the_edges():
+    scheduler = calendar_scheduler()
+    midday = scheduler.next_interval(1, eastern(*TRADING_DAY, 12))
+    near_close = scheduler.next_interval(1, eastern(*TRADING_DAY, 15, 45))
+    assert near_close < midday
+
+
+def test_next_interval_waits_for_midnight_outside_session():
+    scheduler = calendar_scheduler()
+    now = eastern(*TRADING_DAY, 17)
+    assert scheduler.next_interval(1, now) == 7 * 3600 + 1
+
+
+def test_next_interval_with_extended_hours_after_close():
+    scheduler = calendar_scheduler(extended_hours=True)
+    assert scheduler.next_interval(1, eastern(*TRADING_DAY, 17)) < 7 * 3600
+
+
+def test_next_interval_with_exhausted_budget():
+    scheduler = calendar_scheduler(used=25)
+    now = eastern(*TRADING_DAY, 12)
+    assert scheduler.next_interval(1, now) == 12 * 3600 + 1
+
+
+def test_next_interval_respects_min_interval():
+    scheduler = calendar_scheduler(per_day=100_000)
+    assert scheduler.next_interval(1, eastern(*TRADING_DAY, 12)) == scheduler.min_interval
+
+
+def test_record_persists_off_the_loop(tmp_path):
+    path = tmp_path / 'quota_state.json'
+    budget = QuotaBudget(per_minute=5, per_day=25, path=str(path))
+    budget.record(2)
+    assert not path.exists()
+
+    asyncio.run(budget.persist())
+    assert json.loads(path.read_text())['used'] == 2
+    assert QuotaBudget(per_minute=5, per_day=25, path=str(path)).used_today == 2
+
+
+def test_failed_save_removes_temp_file(tmp_path, monkeypatch):
+    budget = QuotaBudget(per_minute=5, per_day=25, path=str(tmp_path / 'quota_state.json'))
+    budget.record(1)
+
+    def fail(src, dst):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(os, 'replace', fail)
+    asyncio.run(budget.persist())
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from quotes import QuoteCache, make_quote
+
+
+def aged(name, seconds):
+    return make_quote(name, 100.0, 1.0, timestamp=datetime.now() - timedelta(seconds=seconds))
+
+
+class Loader:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    async def __call__(self, names):
+        self.calls.append(list(names))
+        await asyncio.sleep(0)
+        if self.fail:
+            return {}
+        return {name: make_quote(name, 200.0, 2.0) for name in names}
+
+
+def make_cache(loader, age):
+    cache = QuoteCache(loader, ['MSTR'], ttl=300, stale_while_revalidate=60, stale_if_error=3600)
+    cache.states['MSTR'].record(aged('MSTR', age))
+    return cache
+
+
+def test_fresh_quote_is_served_without_loading():
+    async def scenario():
+        loader = Loader()
+        cache = make_cache(loader, 10)
+        assert (await cache.get('MSTR'))['price'] == 100.0
+        assert loader.calls == []
+    asyncio.run(scenario())
+
+
+def test_stale_quote_is_served_while_refreshing_in_background():
+    async def scenario():
+        loader = Loader()
+        cache = make_cache(loader, 330)
+        assert (await cache.get('MSTR'))['price'] == 100.0
+        assert cache.refreshing
+        await asyncio.sleep(0.01)
+        assert loader.calls == [['MSTR']]
+        assert cache.peek('MSTR')['price'] == 200.0
+    asyncio.run(scenario())
+
+
+def test_expired_quote_waits_for_refresh():
+    async def scenario():
+        cache = make_cache(Loader(), 1000)
+        assert (await cache.get('MSTR'))['price'] == 200.0
+    asyncio.run(scenario())
+
+
+def test_stale_if_error_window():
+    async def scenario():
+        within = make_cache(Loader(fail=True), 1000)
+        assert (await within.get('MSTR'))['price'] == 100.0
+        assert within.usable('MSTR') is not None
+
+        past = make_cache(Loader(fail=True), 300 + 3600 + 10)
+        assert await past.get('MSTR') is None
+        assert past.usable('MSTR') is None
+        assert past.states['MSTR'].failures == 1
+    asyncio.run(scenario())
+
+
+def test_concurrent_reads_share_one_refresh():
+    async def scenario():
+        loader = Loader()
+        cache = make_cache(loader, 1000)
+        await asyncio.gather(cache.get('MSTR'), cache.get('MSTR'), cache.refresh(['MSTR']))
+        assert loader.calls == [['MSTR']]
+    asyncio.run(scenario())
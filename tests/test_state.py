@@ -0,0 +1,37 @@
+import os
+
+from quotes import make_quote
+from state import StateStore
+
+
+def test_round_trip(tmp_path):
+    store = StateStore(str(tmp_path / 'state.json'))
+    quote = make_quote('MSTR', 350.25, -4.5, volume=1000.0)
+    store.save({'MSTR': quote}, {42: 'MSTR: $350.25 📉'}, 'abc')
+
+    snapshot = store.load()
+    assert snapshot['quotes']['MSTR']['price'] == 350.25
+    assert snapshot['applied'] == {'42': 'MSTR: $350.25 📉'}
+    assert snapshot['command_signature'] == 'abc'
+    assert 'budget' not in snapshot
+
+
+def test_failed_save_keeps_snapshot_and_removes_temp_file(tmp_path, monkeypatch):
+    path = tmp_path / 'state.json'
+    store = StateStore(str(path))
+    store.save({}, {1: 'first'})
+
+    def fail(src, dst):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(os, 'replace', fail)
+    store.save({}, {1: 'second'})
+
+    assert os.listdir(tmp_path) == ['state.json']
+    assert store.load()['applied'] == {'1': 'first'}
+
+
+def test_disabled_without_path(tmp_path):
+    store = StateStore('')
+    store.save({}, {1: 'nick'})
+    assert store.load() == {}
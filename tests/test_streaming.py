@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('aiohttp')
+from aiohttp import web
+
+from streaming import LatestSlot, TickStream
+
+
+def test_reconnects_after_undecodable_feed():
+    async def scenario():
+        connections = 0
+
+        async def events(request):
+            nonlocal connections
+            connections += 1
+            response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+            await response.prepare(request)
+            if connections == 1:
+                await response.write(b'data: \xff\xfe\n\n')
+            else:
+                await response.write(b'data: {"symbol": "MSTR", "price": 351.5}\n\n')
+                await asyncio.sleep(0.2)
+            return response
+
+        app = web.Application()
+        app.router.add_get('/events', events)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = runner.addresses[0][1]
+
+        slot = LatestSlot()
+        stream = TickStream(f'http://127.0.0.1:{port}/events', ['MSTR'], slot, reconnect_delay=0.01)
+        task = asyncio.create_task(stream.run())
+        try:
+            await asyncio.wait_for(slot.wait_newer(0), timeout=5)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await runner.cleanup()
+        assert slot.values['MSTR']['price'] == 351.5
+        assert stream.reconnects >= 1
+    asyncio.run(scenario())